@@ -2,8 +2,15 @@
 Analyzer module for scanning pyproject.toml files and checking for updates
 """
 
+import functools
+import hashlib
 import logging
-from dataclasses import dataclass
+import os
+import re
+from collections.abc import Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
 from pathlib import Path
 
 try:
@@ -11,39 +18,157 @@ try:
 except ImportError:
     import tomli as tomllib
 
+try:
+    # Faster decoding when installed
+    from orjson import loads as json_loads  # pyright: ignore[reportMissingImports]
+except ImportError:
+    from json import loads as json_loads
+
 import requests
-from packaging.version import parse
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import (
+    InvalidSdistFilename,
+    InvalidWheelFilename,
+    parse_sdist_filename,
+    parse_wheel_filename,
+)
+from packaging.version import InvalidVersion, Version, parse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from dependapy import __version__
+from dependapy.cache import JsonCache
 
 logger = logging.getLogger("dependapy.analyzer")
 
+# PEP 691 JSON simple index, a much smaller payload than /pypi/<name>/json
+PYPI_API_URL_TEMPLATE = "https://pypi.org/simple/{package_name}/"
+PYPI_SIMPLE_ACCEPT = "application/vnd.pypi.simple.v1+json"
+# Full project metadata, only used when no file name on the index parses
+PYPI_JSON_API_URL_TEMPLATE = "https://pypi.org/pypi/{package_name}/json"
+PYTHON_VERSIONS_API_URL = "https://endoflife.date/api/python.json"
+DEFAULT_API_TIMEOUT = 10
+
+# Upper bound on concurrent HTTP requests, matching the connection pool size
+# so worker threads never wait on or discard pooled connections
+MAX_CONNECTIONS = 32
+
+# Version objects are immutable, so parsed results can be shared freely; the
+# same version strings recur across dependencies and pyproject.toml files
+_cached_parse = functools.lru_cache(maxsize=4096)(parse)
+
+# Shared HTTP session so PyPI and endoflife.date lookups reuse pooled
+# keep-alive connections instead of paying a TLS handshake per request
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        # pool_connections counts hosts (PyPI and endoflife.date), while
+        # pool_maxsize bounds the connections kept open to each of them
+        pool_connections=4,
+        pool_maxsize=MAX_CONNECTIONS,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+        ),
+    ),
+)
+_SESSION.headers["Accept"] = "application/json"
+_SESSION.headers["User-Agent"] = f"dependapy/{__version__}"
+
+
+# Python releases change a few times a year, so they're cached for a day
+_PYTHON_VERSIONS_CACHE = JsonCache("python", ttl=24 * 60 * 60)
+
 
 # Get the three latest Python minor versions
 def get_latest_python_versions() -> list[str]:
     """Get the three latest Python 3.x minor versions"""
+    if "latest" in _PYTHON_VERSIONS_CACHE:
+        return _PYTHON_VERSIONS_CACHE["latest"]
+
     try:
-        response = requests.get("https://endoflife.date/api/python.json", timeout=10)
+        response = _SESSION.get(PYTHON_VERSIONS_API_URL, timeout=DEFAULT_API_TIMEOUT)
         response.raise_for_status()
-        python_versions = response.json()
+        python_versions = json_loads(response.content)
 
         # Filter for Python 3.x versions and sort
         py3_versions = [
             v["cycle"] for v in python_versions if v["cycle"].startswith("3.")
         ]
-        py3_versions.sort(key=lambda x: parse(x), reverse=True)
+        py3_versions.sort(key=_cached_parse, reverse=True)
 
         # Get the three latest minor versions
         latest_versions = py3_versions[:3]
         logger.info("Latest Python versions: %s", ", ".join(latest_versions))
+        _PYTHON_VERSIONS_CACHE["latest"] = latest_versions
     except Exception:
         logger.exception("Failed to get latest Python versions")
-        # Fallback to hard-coded versions if API fails
+        # Fallback to hard-coded versions if API fails; not cached, so the
+        # next run tries again
         return ["3.12", "3.11", "3.10"]
     else:
         return latest_versions
 
 
-# Cache for PyPI package versions to avoid repeated requests
-_PYPI_CACHE: dict[str, str | None] = {}
+# Cache for PyPI package versions to avoid repeated requests, persisted to
+# disk so repeated runs within DEPENDAPY_CACHE_TTL skip the network entirely
+_PYPI_CACHE = JsonCache("pypi")
+
+
+def _version_from_filename(filename: str) -> Version | None:
+    """Extract the version from a wheel or sdist filename"""
+    try:
+        if filename.endswith(".whl"):
+            return parse_wheel_filename(filename)[1]
+        if filename.endswith((".tar.gz", ".zip")):
+            return parse_sdist_filename(filename)[1]
+    except (InvalidWheelFilename, InvalidSdistFilename, InvalidVersion):
+        pass
+    return None
+
+
+def _latest_version_from_files(files: list[dict]) -> str | None:
+    """
+    Get the latest release from the files listed in a simple index response
+
+    Yanked files are ignored and pre-releases are only considered when a
+    project has no final releases, matching PyPI's own "latest version".
+    """
+    versions = set()
+    for file_info in files:
+        if file_info.get("yanked"):
+            continue
+        version = _version_from_filename(file_info["filename"])
+        if version is not None:
+            versions.add(version)
+
+    releases = [v for v in versions if not v.is_prerelease] or list(versions)
+    if not releases:
+        return None
+    return str(max(releases))
+
+
+def _latest_version_from_json_api(package_name: str) -> str | None:
+    """Get the version PyPI reports as latest in the project's JSON metadata"""
+    response = _SESSION.get(
+        PYPI_JSON_API_URL_TEMPLATE.format(package_name=package_name),
+        timeout=DEFAULT_API_TIMEOUT,
+    )
+    response.raise_for_status()
+    version = json_loads(response.content)["info"]["version"]
+    if not version:
+        return None
+
+    # Projects without parsable file names rarely have a PEP 440 version
+    # either, and comparing against one would abort the whole scan
+    try:
+        _cached_parse(version)
+    except InvalidVersion:
+        logger.warning("Ignoring invalid version %r of %s", version, package_name)
+        return None
+    return version
 
 
 def get_latest_version(package_name: str) -> str | None:
@@ -52,8 +177,10 @@ def get_latest_version(package_name: str) -> str | None:
         return _PYPI_CACHE[package_name]
 
     try:
-        response = requests.get(
-            f"https://pypi.org/pypi/{package_name}/json", timeout=10
+        response = _SESSION.get(
+            PYPI_API_URL_TEMPLATE.format(package_name=package_name),
+            headers={"Accept": PYPI_SIMPLE_ACCEPT},
+            timeout=DEFAULT_API_TIMEOUT,
         )
         if response.status_code == 404:
             logger.warning("Package %s not found on PyPI", package_name)
@@ -61,41 +188,63 @@ def get_latest_version(package_name: str) -> str | None:
             return None
 
         response.raise_for_status()
-        data = response.json()
-        latest_version = data["info"]["version"]
+        # Decode the raw bytes directly, skipping requests' charset detection
+        data = json_loads(response.content)
+        latest_version = _latest_version_from_files(data["files"])
+        if latest_version is None and data["files"]:
+            latest_version = _latest_version_from_json_api(package_name)
         _PYPI_CACHE[package_name] = latest_version
     except Exception:
+        # Not cached, so a transient failure isn't persisted to disk
         logger.exception("Error fetching version for %s", package_name)
-        _PYPI_CACHE[package_name] = None
         return None
     else:
         return latest_version
 
 
+# Fast path for the common "name", "name==X" and "name>=X" forms; anything
+# with extras, markers or several constraints goes through Requirement
+_SIMPLE_DEP_RE = re.compile(
+    r"\s*([A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*"
+    r"(?:(?:==|>=)\s*"
+    r"([0-9]+(?:\.[0-9]+)*(?:(?:a|b|rc)[0-9]+)?(?:\.post[0-9]+)?(?:\.dev[0-9]+)?))?"
+    r"\s*"
+)
+
+
+@functools.lru_cache(maxsize=4096)
 def parse_dependency_version(dependency_spec: str) -> tuple[str, str]:
-    """Parse package and version from a dependency specifier"""
+    """
+    Parse package and version from a PEP 508 dependency specifier
+
+    The version is the lowest ``==`` or ``>=`` bound; extras, markers and other
+    operators are ignored. Returns an empty version if there is no such bound.
+    """
     # Remove quotes if present
     if dependency_spec.startswith('"') and dependency_spec.endswith('"'):
         dependency_spec = dependency_spec[1:-1]
 
-    # Check for version specifiers
-    if ">=" in dependency_spec:
-        parts = dependency_spec.split(">=")
-        package = parts[0].strip()
-        version = parts[1].strip()
-    elif "==" in dependency_spec:
-        parts = dependency_spec.split("==")
-        package = parts[0].strip()
-        version = parts[1].strip()
-    else:
-        # No version specifier found
-        package = dependency_spec.strip()
-        version = ""
+    match = _SIMPLE_DEP_RE.fullmatch(dependency_spec)
+    if match:
+        return match.group(1), match.group(2) or ""
+
+    try:
+        requirement = Requirement(dependency_spec)
+    except InvalidRequirement:
+        return dependency_spec.strip(), ""
 
-    return package, version
+    versions = [
+        spec.version
+        for spec in requirement.specifier
+        if spec.operator in ("==", ">=") and not spec.version.endswith(".*")
+    ]
+    if not versions:
+        return requirement.name, ""
 
+    return requirement.name, min(versions, key=_cached_parse)
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class UpdateInfo:
     """Information about a package that needs an update"""
 
@@ -105,7 +254,7 @@ class UpdateInfo:
     file_path: Path
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PythonVersionUpdateInfo:
     """Information about Python version that needs an update"""
 
@@ -114,29 +263,55 @@ class PythonVersionUpdateInfo:
     file_path: Path
 
 
-@dataclass
+# Not frozen: scan_repository attaches the content once the result is built
+@dataclass(slots=True)
 class FileAnalysisResult:
     """Result of analyzing a pyproject.toml file"""
 
     file_path: Path
     package_updates: list[UpdateInfo]
     python_update: PythonVersionUpdateInfo | None = None
+    # Raw file content read during the scan, so the updater needn't read it again
+    content: bytes | None = field(default=None, repr=False, compare=False)
+
+
+# Parsed [project] tables from the prefetch pass, each consumed once by scan_file
+_TOML_CACHE: dict[Path, dict] = {}
+
+
+def _load_project_section(file_path: Path) -> dict:
+    """Get the [project] table of a pyproject.toml file"""
+    project_section = _TOML_CACHE.pop(file_path, None)
+    if project_section is not None:
+        return project_section
+
+    return _parse_project_section(file_path.read_bytes())
+
+
+def _parse_project_section(content: bytes) -> dict:
+    """Parse the [project] table out of pyproject.toml content"""
+    return tomllib.loads(content.decode("utf-8")).get("project", {})
 
 
 def scan_file(
-    file_path: Path, latest_python_versions: list[str]
+    file_path: Path,
+    latest_python_versions: list[str],
+    latest_versions: Mapping[str, str | None] | None = None,
 ) -> FileAnalysisResult | None:
-    """Scan a single pyproject.toml file for updates"""
+    """
+    Scan a single pyproject.toml file for updates
+
+    Latest package versions are taken from latest_versions when given,
+    falling back to get_latest_version for packages missing from it
+    """
     logger.info("Analyzing %s", file_path)
 
     try:
-        with file_path.open("rb") as f:
-            pyproject = tomllib.load(f)
+        project_section = _load_project_section(file_path)
     except Exception:
         logger.exception("Failed to parse %s", file_path)
         return None
 
-    project_section = pyproject.get("project", {})
     if not project_section:
         logger.warning("No [project] section in %s, skipping", file_path)
         return None
@@ -146,9 +321,12 @@ def scan_file(
     requires_python = project_section.get("requires-python")
     if requires_python:
         min_python_version = get_min_python_version(requires_python)
-        if min_python_version and min_python_version not in latest_python_versions:
+        if (
+            min_python_version is not None
+            and min_python_version not in latest_python_versions
+        ):
             # We should update the Python version constraint
-            min_latest = min(latest_python_versions, key=lambda v: parse(v))
+            min_latest = min(latest_python_versions, key=_cached_parse)
             recommended = f">={min_latest}"
             python_update = PythonVersionUpdateInfo(
                 current_constraint=requires_python,
@@ -180,11 +358,14 @@ def scan_file(
         if not current_version:  # Skip if we couldn't extract a version
             continue
 
-        latest_version = get_latest_version(package_name)
-        if not latest_version:
+        if latest_versions is not None and package_name in latest_versions:
+            latest_version = latest_versions[package_name]
+        else:
+            latest_version = get_latest_version(package_name)
+        if latest_version is None:
             continue
 
-        if parse(latest_version) > parse(current_version):
+        if _cached_parse(latest_version) > _cached_parse(current_version):
             update = UpdateInfo(
                 package_name=package_name,
                 current_version=current_version,
@@ -210,31 +391,233 @@ def scan_file(
     )
 
 
+# Minimum Python 3 minor version of a ">=" constraint, e.g. ">=3.8.1,<4.0"
+_MIN_PYTHON_RE = re.compile(r">=\s*(3\.\d+)")
+
+
 def get_min_python_version(requires_python: str) -> str | None:
     """Extract minimum Python version from requires-python constraint"""
-    # Handle common formats like ">=3.8", ">=3.8,<4.0", ">=3.8.0"
-    if requires_python.startswith(">="):
-        version_part = requires_python.split(",")[0].strip()[2:]
-        # Ensure we get just the minor version (3.x)
-        if version_part.startswith("3."):
-            parts = version_part.split(".")
-            if len(parts) >= 2:
-                return f"{parts[0]}.{parts[1]}"
-    return None
+    match = _MIN_PYTHON_RE.match(requires_python)
+    return match.group(1) if match else None
+
+
+# Directories that never contain project metadata worth updating
+_SKIP_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".venv",
+        "venv",
+        "node_modules",
+        "__pycache__",
+        ".tox",
+        ".mypy_cache",
+        "dist",
+        "build",
+    }
+)
+
+
+def _iter_pyproject(root: Path) -> Iterator[Path]:
+    """Yield pyproject.toml files below root, skipping VCS and build dirs"""
+    stack = [os.fspath(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    # DirEntry caches the file type, so no extra stat() calls
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in _SKIP_DIRS:
+                            stack.append(entry.path)
+                    elif entry.name == "pyproject.toml" and entry.is_file():
+                        yield Path(entry.path)
+        except OSError:
+            logger.warning("Cannot read directory %s, skipping", directory)
+
+
+def _package_names(file_path: Path, content: bytes) -> set[str] | None:
+    """
+    Parse a pyproject.toml file and get the names of versioned dependencies
+
+    Returns None if the file can't be parsed
+    """
+    try:
+        project_section = _parse_project_section(content)
+    except Exception:
+        # scan_file reports the parse failure for this file
+        logger.debug("Skipping unparsable %s during prefetch", file_path)
+        return None
+
+    # Hand the parsed table to scan_file so the file isn't parsed twice
+    _TOML_CACHE[file_path] = project_section
+    all_deps = list(project_section.get("dependencies", []))
+    for deps in project_section.get("optional-dependencies", {}).values():
+        all_deps.extend(deps)
+
+    # parse_dependency_version is memoized, so specifiers repeated across a
+    # monorepo are only parsed once
+    package_names = set()
+    for dep in all_deps:
+        package_name, current_version = parse_dependency_version(dep)
+        if current_version:
+            package_names.add(package_name)
+
+    return package_names
+
+
+# Analysis results of pyproject.toml files, keyed by the SHA-256 of their
+# content, so unchanged files are neither parsed nor compared again
+_SCAN_CACHE = JsonCache("scan")
+
+
+def _result_to_cache(result: FileAnalysisResult | None) -> dict | None:
+    """Convert an analysis result to a JSON-serializable cache entry"""
+    if result is None:
+        return None
+
+    python_update = result.python_update
+    return {
+        "package_updates": [
+            [update.package_name, update.current_version, update.latest_version]
+            for update in result.package_updates
+        ],
+        "python_update": (
+            [python_update.current_constraint, python_update.recommended_constraint]
+            if python_update
+            else None
+        ),
+    }
+
+
+def _result_from_cache(
+    file_path: Path, entry: dict | None
+) -> FileAnalysisResult | None:
+    """Rebuild an analysis result for file_path from a cache entry"""
+    if entry is None:
+        return None
+
+    python_update = None
+    if entry["python_update"]:
+        current_constraint, recommended_constraint = entry["python_update"]
+        python_update = PythonVersionUpdateInfo(
+            current_constraint=current_constraint,
+            recommended_constraint=recommended_constraint,
+            file_path=file_path,
+        )
+
+    return FileAnalysisResult(
+        file_path=file_path,
+        package_updates=[
+            UpdateInfo(
+                package_name=package_name,
+                current_version=current_version,
+                latest_version=latest_version,
+                file_path=file_path,
+            )
+            for package_name, current_version, latest_version in entry[
+                "package_updates"
+            ]
+        ],
+        python_update=python_update,
+    )
 
 
 def scan_repository(repo_path: Path) -> list[FileAnalysisResult]:
     """Scan repository for pyproject.toml files and analyze them"""
-    latest_python_versions = get_latest_python_versions()
-
-    # Find all pyproject.toml files recursively
-    pyproject_files = list(repo_path.glob("**/pyproject.toml"))
-    logger.info("Found %d pyproject.toml files", len(pyproject_files))
+    with ThreadPoolExecutor(max_workers=MAX_CONNECTIONS) as fetcher:
+        # Look up Python releases while the repository is walked and parsed
+        python_versions_future = fetcher.submit(get_latest_python_versions)
+
+        # Start each PyPI lookup as soon as the first file using the package
+        # is parsed, so network requests overlap with walking and parsing
+        pyproject_files = []
+        cached_results: dict[Path, FileAnalysisResult | None] = {}
+        scan_cache_keys: dict[Path, tuple[str, set[str]]] = {}
+        contents: dict[Path, bytes] = {}
+        lookups: dict[str, Future[str | None]] = {}
+        for file_path in _iter_pyproject(repo_path):
+            pyproject_files.append(file_path)
+            try:
+                content = file_path.read_bytes()
+            except OSError:
+                # scan_file reports the unreadable file
+                continue
+
+            contents[file_path] = content
+
+            # Without either key there is nothing to update, so skip parsing
+            if b"dependencies" not in content and b"requires-python" not in content:
+                logger.debug("Nothing to update in %s", file_path)
+                cached_results[file_path] = None
+                continue
+
+            # Reuse the analysis of an unchanged file if it was made against
+            # the same Python releases
+            digest = hashlib.sha256(content).hexdigest()
+            if digest in _SCAN_CACHE:
+                entry = _SCAN_CACHE[digest]
+                latest_python_versions = python_versions_future.result()
+                try:
+                    if entry["python_versions"] == latest_python_versions:
+                        cached_results[file_path] = _result_from_cache(
+                            file_path, entry["result"]
+                        )
+                except (KeyError, TypeError, ValueError):
+                    # An entry in another format is a miss, and is overwritten
+                    logger.debug("Ignoring malformed cached analysis of %s", file_path)
+                if file_path in cached_results:
+                    logger.info("Reusing cached analysis of %s", file_path)
+                    continue
+
+            package_names = _package_names(file_path, content)
+            if package_names is None:
+                continue
+
+            scan_cache_keys[file_path] = (digest, package_names)
+            # Cached packages are answered without a request by the worker
+            for package_name in package_names - lookups.keys():
+                lookups[package_name] = fetcher.submit(get_latest_version, package_name)
+
+        logger.info("Found %d pyproject.toml files", len(pyproject_files))
+        latest_python_versions = python_versions_future.result()
+        latest_versions = {name: future.result() for name, future in lookups.items()}
+
+    files_to_scan = [path for path in pyproject_files if path not in cached_results]
+    if files_to_scan:
+        # Overlap file reads and parsing across files; map() preserves order
+        with ThreadPoolExecutor(max_workers=min(32, len(files_to_scan))) as executor:
+            scanned = executor.map(
+                scan_file,
+                files_to_scan,
+                repeat(latest_python_versions),
+                repeat(latest_versions),
+            )
+            cached_results.update(zip(files_to_scan, scanned, strict=True))
+    _TOML_CACHE.clear()
+
+    for file_path, (digest, package_names) in scan_cache_keys.items():
+        # A failed PyPI lookup isn't cached, and neither is a result that
+        # missed updates because of it
+        if all(package_name in _PYPI_CACHE for package_name in package_names):
+            # Date the entry by its oldest lookup so it expires with that one
+            # rather than outliving it by up to a full TTL
+            _SCAN_CACHE.set(
+                digest,
+                {
+                    "python_versions": latest_python_versions,
+                    "result": _result_to_cache(cached_results[file_path]),
+                },
+                fetched_at=min(
+                    map(_PYPI_CACHE.fetched_at, package_names), default=None
+                ),
+            )
 
     results = []
     for file_path in pyproject_files:
-        result = scan_file(file_path, latest_python_versions)
-        if result:
+        result = cached_results[file_path]
+        if result is not None:
+            result.content = contents.get(file_path)
             results.append(result)
 
     return results
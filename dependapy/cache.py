@@ -0,0 +1,194 @@
+"""
+Cache module for persisting lookup results between runs
+"""
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger("dependapy.cache")
+
+# Entries older than this (in seconds) are discarded when loading from disk
+DEFAULT_CACHE_TTL = 6 * 60 * 60
+
+
+# Set from the command line, taking precedence over the environment variables
+_cache_dir_override: Path | None = None
+_cache_ttl_override: float | None = None
+
+
+def set_cache_dir(cache_dir: Path | None) -> None:
+    """Override the cache directory for caches that haven't been loaded yet"""
+    global _cache_dir_override
+    _cache_dir_override = cache_dir
+
+
+def get_cache_dir() -> Path:
+    """Get the directory used for dependapy's on-disk caches"""
+    if _cache_dir_override is not None:
+        return _cache_dir_override
+
+    cache_dir = os.environ.get("DEPENDAPY_CACHE_DIR")
+    if cache_dir:
+        return Path(cache_dir)
+    return Path.home() / ".cache" / "dependapy"
+
+
+def set_cache_ttl(cache_ttl: float | None) -> None:
+    """Override the cache TTL for caches that haven't been loaded yet"""
+    global _cache_ttl_override
+    _cache_ttl_override = cache_ttl
+
+
+def _configured_cache_ttl() -> float | None:
+    """Get the TTL set by --max-age or DEPENDAPY_CACHE_TTL, if any"""
+    if _cache_ttl_override is not None:
+        return _cache_ttl_override
+
+    value = os.environ.get("DEPENDAPY_CACHE_TTL")
+    if value is None:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning("Invalid DEPENDAPY_CACHE_TTL %r, using default", value)
+        return None
+
+
+def get_cache_ttl() -> float:
+    """Get the cache TTL in seconds from DEPENDAPY_CACHE_TTL"""
+    cache_ttl = _configured_cache_ttl()
+    return DEFAULT_CACHE_TTL if cache_ttl is None else cache_ttl
+
+
+def is_cache_disabled() -> bool:
+    """Check whether DEPENDAPY_NO_CACHE turns off the on-disk caches"""
+    return os.environ.get("DEPENDAPY_NO_CACHE", "") not in ("", "0")
+
+
+class JsonCache:
+    """
+    Thread-safe key/value cache backed by a JSON file
+
+    The file is read lazily on first access, entries older than the TTL are
+    dropped at load time, and changes are written back on process exit.
+    Setting DEPENDAPY_NO_CACHE keeps the cache in memory only.
+    """
+
+    def __init__(self, name: str, ttl: float | None = None) -> None:
+        self.name = name
+        # None follows get_cache_ttl(); a fixed TTL can still be shortened by
+        # --max-age or DEPENDAPY_CACHE_TTL, since both bound every cached lookup
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[Any, float]] | None = None
+        self._path: Path | None = None
+        self._dirty = False
+        atexit.register(self.flush)
+
+    def _effective_ttl(self) -> float:
+        """Get the maximum age of entries kept when loading"""
+        if self.ttl is None:
+            return get_cache_ttl()
+
+        cache_ttl = _configured_cache_ttl()
+        return self.ttl if cache_ttl is None else min(self.ttl, cache_ttl)
+
+    def _load(self) -> dict[str, tuple[Any, float]]:
+        """Load entries from disk, dropping expired ones"""
+        if self._entries is not None:
+            return self._entries
+
+        with self._lock:
+            if self._entries is not None:
+                return self._entries
+
+            entries: dict[str, tuple[Any, float]] = {}
+            if is_cache_disabled():
+                # Entries still live for the rest of the process, but nothing
+                # is read from or written to disk
+                self._entries = entries
+                return entries
+
+            self._path = get_cache_dir() / f"{self.name}.json"
+            ttl = self._effective_ttl()
+            cutoff = time.time() - ttl
+            try:
+                raw = json.loads(self._path.read_bytes())
+                # Valid JSON of the wrong shape is as unusable as invalid JSON
+                for key, (value, fetched_at) in raw.items():
+                    if fetched_at >= cutoff:
+                        entries[key] = (value, fetched_at)
+            except FileNotFoundError:
+                pass
+            except Exception:
+                logger.warning("Ignoring unreadable cache file %s", self._path)
+                entries.clear()
+
+            self._entries = entries
+            return entries
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._load()
+
+    def __getitem__(self, key: str) -> Any:
+        return self._load()[key][0]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def set(self, key: str, value: Any, fetched_at: float | None = None) -> None:
+        """Store a value, dated now unless it derives from older data"""
+        entries = self._load()
+        with self._lock:
+            entries[key] = (value, time.time() if fetched_at is None else fetched_at)
+            self._dirty = True
+
+    def fetched_at(self, key: str) -> float:
+        """Get the time an entry was stored"""
+        return self._load()[key][1]
+
+    def __delitem__(self, key: str) -> None:
+        entries = self._load()
+        with self._lock:
+            del entries[key]
+            self._dirty = True
+
+    def flush(self) -> None:
+        """Write the cache to disk if it changed"""
+        with self._lock:
+            if not self._dirty or self._entries is None or self._path is None:
+                return
+
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_name = tempfile.mkstemp(
+                    dir=self._path.parent, prefix=f".{self.name}-", suffix=".tmp"
+                )
+            except OSError:
+                logger.warning("Failed to write cache file %s", self._path)
+                return
+
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_name, self._path)
+                self._dirty = False
+            except OSError:
+                # Don't leave a partial temp file behind in the cache dir
+                os.unlink(tmp_name)
+                logger.warning("Failed to write cache file %s", self._path)
+
+    def reset(self) -> None:
+        """Forget in-memory state so the next access reloads from disk"""
+        with self._lock:
+            self._entries = None
+            self._path = None
+            self._dirty = False
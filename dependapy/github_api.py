@@ -2,49 +2,65 @@
 GitHub API module for creating and updating pull requests
 """
 
+import functools
 import importlib.util
+import json
 import logging
 import os
+import re
 import subprocess
 from pathlib import Path
 
 logger = logging.getLogger("dependapy.github_api")
 
 
-def get_repo_info(repo_path: Path) -> tuple:
+# Commit identity passed per invocation instead of written to the repo config
+_GIT_IDENTITY = [
+    "-c",
+    "user.name=dependapy-bot",
+    "-c",
+    "user.email=dependapy-bot@noreply.github.com",
+]
+
+# Matches the owner and repository in SSH and HTTPS GitHub remote URLs
+_GITHUB_REMOTE_RE = re.compile(r"github\.com[:/]([^/]+)/([^/]+?)(?:\.git)?/?$")
+
+
+def get_repo_info(repo_path: Path) -> tuple[str | None, str | None]:
     """
     Get repository owner and name from remote URL
     Returns a tuple of (owner, repo)
     """
+    return _get_repo_info_cached(str(repo_path.resolve()))
+
+
+@functools.lru_cache(maxsize=8)
+def _get_repo_info_cached(repo_path: str) -> tuple[str | None, str | None]:
+    """Look up the origin remote once per repository path"""
     try:
         # Get the remote URL
         remote_url = subprocess.check_output(  # nosec B607
-            ["git", "-C", str(repo_path), "config", "--get", "remote.origin.url"],
+            ["git", "-C", repo_path, "config", "--get", "remote.origin.url"],
             text=True,
         ).strip()
-
-        # Parse URL to extract owner and repo name
-        if "github.com" in remote_url:
-            # Handle SSH format: git@github.com:owner/repo.git
-            if remote_url.startswith("git@"):
-                path = remote_url.split(":", 1)[1]
-            # Handle HTTPS format: https://github.com/owner/repo.git
-            else:
-                path = remote_url.split("github.com/", 1)[1]
-
-            # Remove .git suffix if present
-            if path.endswith(".git"):
-                path = path[:-4]
-
-            parts = path.split("/")
-            if len(parts) >= 2:
-                return parts[0], parts[1]
     except Exception:
         logger.exception("Failed to get repository info")
+        return None, None
+
+    # Handles git@github.com:owner/repo.git and https://github.com/owner/repo.git
+    match = _GITHUB_REMOTE_RE.search(remote_url)
+    if match:
+        return match.group(1), match.group(2)
 
     return None, None
 
 
+@functools.cache
+def _has_pygithub() -> bool:
+    """Check once per process whether PyGithub is installed"""
+    return importlib.util.find_spec("github") is not None
+
+
 def create_or_update_pull_request(
     repo_path: Path,
     branch_name: str,
@@ -59,18 +75,16 @@ def create_or_update_pull_request(
     Returns the URL of the created/updated pull request
     """
     # First try using PyGithub
-    try:
-        # Check if PyGithub is available
-        if importlib.util.find_spec("github") is not None:
-            logger.info("Using PyGithub for PR creation")
-            return create_pr_with_pygithub(
-                repo_path=repo_path,
-                branch_name=branch_name,
-                updated_files=updated_files,
-                github_token=github_token,
-            )
-    except ImportError:
-        logger.info("PyGithub not available, trying gh CLI")
+    if _has_pygithub():
+        logger.info("Using PyGithub for PR creation")
+        return create_pr_with_pygithub(
+            repo_path=repo_path,
+            branch_name=branch_name,
+            updated_files=updated_files,
+            github_token=github_token,
+        )
+
+    logger.info("PyGithub not available, trying gh CLI")
 
     # Fall back to gh CLI if PyGithub is not available
     try:
@@ -107,14 +121,14 @@ def create_pr_with_pygithub(
 
     # Setup git for committing
     setup_git_for_commit(repo_path, branch_name)
+    repo_arg = os.fspath(repo_path)
 
     # Add updated files to git
-    for file_path in updated_files:
-        subprocess.run(["git", "-C", str(repo_path), "add", str(file_path)], check=True)
+    git_add(repo_path, updated_files)
 
     # Check if there are changes to commit
     status = subprocess.check_output(
-        ["git", "-C", str(repo_path), "status", "--porcelain"],
+        ["git", "-C", repo_arg, "status", "--porcelain"],
         text=True,
     ).strip()
 
@@ -125,12 +139,13 @@ def create_pr_with_pygithub(
     # Commit changes
     commit_message = "chore(dependapy): update dependencies and python version"
     subprocess.run(
-        ["git", "-C", str(repo_path), "commit", "-m", commit_message], check=True
+        ["git", "-C", repo_arg, *_GIT_IDENTITY, "commit", "-m", commit_message],
+        check=True,
     )
 
     # Push changes
     subprocess.run(
-        ["git", "-C", str(repo_path), "push", "origin", branch_name, "--force"],
+        ["git", "-C", repo_arg, "push", "origin", branch_name, "--force"],
         check=True,
     )
 
@@ -138,12 +153,10 @@ def create_pr_with_pygithub(
     g = Github(github_token)
     repo = g.get_repo(f"{owner}/{repo_name}")
 
-    # Check for existing PR from this branch
-    existing_pr = None
-    for pr in repo.get_pulls(state="open"):
-        if pr.head.ref == branch_name:
-            existing_pr = pr
-            break
+    # Check for existing PR from this branch, filtered by GitHub rather than
+    # paging through every open PR
+    existing_prs = repo.get_pulls(state="open", head=f"{owner}:{branch_name}")
+    existing_pr = next(iter(existing_prs), None)
 
     if existing_pr:
         logger.info("Updating existing PR #%s", existing_pr.number)
@@ -175,18 +188,18 @@ def create_pr_with_gh_cli(
     """Create or update a PR using the gh CLI"""
     # Setup git for committing
     setup_git_for_commit(repo_path, branch_name)
+    repo_arg = os.fspath(repo_path)
 
     # Set environment variable for gh CLI
     env = os.environ.copy()
     env["GITHUB_TOKEN"] = github_token
 
     # Add updated files to git
-    for file_path in updated_files:
-        subprocess.run(["git", "-C", str(repo_path), "add", str(file_path)], check=True)
+    git_add(repo_path, updated_files)
 
     # Check if there are changes to commit
     status = subprocess.check_output(
-        ["git", "-C", str(repo_path), "status", "--porcelain"],
+        ["git", "-C", repo_arg, "status", "--porcelain"],
         text=True,
     ).strip()
 
@@ -197,45 +210,45 @@ def create_pr_with_gh_cli(
     # Commit changes
     commit_message = "chore(dependapy): update dependencies and python version"
     subprocess.run(
-        ["git", "-C", str(repo_path), "commit", "-m", commit_message], check=True
+        ["git", "-C", repo_arg, *_GIT_IDENTITY, "commit", "-m", commit_message],
+        check=True,
     )
 
     # Push changes
     subprocess.run(
-        ["git", "-C", str(repo_path), "push", "origin", branch_name, "--force"],
+        ["git", "-C", repo_arg, "push", "origin", branch_name, "--force"],
         check=True,
     )
 
-    # Check if PR already exists
-    pr_exists = False
+    # Check if PR already exists; the list output already carries its URL
+    existing_prs = []
     try:
         result = subprocess.run(
-            ["gh", "pr", "list", "--head", branch_name, "--json", "number"],
-            cwd=repo_path,
-            env=env,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        pr_exists = (
-            len(result.stdout.strip()) > 2
-        )  # Check if output is more than empty JSON array
-    except subprocess.CalledProcessError:
-        pr_exists = False
-
-    if pr_exists:
-        # PR exists, just get its URL
-        result = subprocess.run(
-            ["gh", "pr", "view", "--head", branch_name, "--json", "url"],
+            [
+                "gh",
+                "pr",
+                "list",
+                "--head",
+                branch_name,
+                "--state",
+                "open",
+                "--json",
+                "number,url",
+                "--limit",
+                "1",
+            ],
             cwd=repo_path,
             env=env,
             capture_output=True,
             text=True,
             check=True,
         )
-        import json
+        existing_prs = json.loads(result.stdout or "[]")
+    except (subprocess.CalledProcessError, json.JSONDecodeError):
+        existing_prs = []
 
-        pr_url = json.loads(result.stdout)["url"]
+    if existing_prs:
+        pr_url = existing_prs[0]["url"]
         logger.info("Existing PR updated: %s", pr_url)
         return pr_url
     else:
@@ -271,52 +284,69 @@ def create_pr_with_gh_cli(
         return pr_url
 
 
-def setup_git_for_commit(repo_path: Path, branch_name: str) -> None:
-    """Configure git for making commits"""
-    # Configure git user
-    subprocess.run(
-        ["git", "-C", str(repo_path), "config", "user.name", "dependapy-bot"],
-        check=True,
-    )
-    subprocess.run(
-        [
-            "git",
-            "-C",
-            str(repo_path),
-            "config",
-            "user.email",
-            "dependapy-bot@noreply.github.com",
-        ],
-        check=True,
-    )
+def _get_arg_max() -> int:
+    """Get the maximum command-line length for subprocesses"""
+    try:
+        return os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):
+        # Not available on Windows, where command lines are limited to 32K
+        return 32768
+
+
+# Files per "git add" call, leaving ample room for long paths
+_GIT_ADD_BATCH_SIZE = max(1, _get_arg_max() // 256)
+
+
+def git_add(repo_path: Path, file_paths: list[Path]) -> None:
+    """Stage files using one git process per batch rather than per file"""
+    repo_arg = os.fspath(repo_path)
+    for start in range(0, len(file_paths), _GIT_ADD_BATCH_SIZE):
+        batch = file_paths[start : start + _GIT_ADD_BATCH_SIZE]
+        subprocess.run(
+            ["git", "-C", repo_arg, "add", "--", *map(os.fspath, batch)],
+            check=True,
+        )
 
+
+def setup_git_for_commit(repo_path: Path, branch_name: str) -> None:
+    """Check out the branch that receives the update commit"""
     # Check if we're in a GitHub Actions environment
     if os.environ.get("GITHUB_ACTIONS") == "true":
         # GitHub Actions-specific git setup
         logger.info("Running in GitHub Actions environment")
 
-    # Get current branch
-    current_branch = subprocess.check_output(
-        ["git", "-C", str(repo_path), "rev-parse", "--abbrev-ref", "HEAD"],
-        text=True,
-    ).strip()
+    repo_arg = os.fspath(repo_path)
+
+    # Checking out the current branch is a no-op, so there's no need to look
+    # up HEAD or verify the branch first; --no-guess keeps git from creating
+    # it from a same-named remote branch
+    try:
+        subprocess.run(
+            ["git", "-C", repo_arg, "checkout", "--no-guess", branch_name],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except subprocess.CalledProcessError as exc:
+        # Only create the branch if it's missing; anything else, such as local
+        # changes the checkout would overwrite, is a real failure
+        verify = subprocess.run(
+            [
+                "git",
+                "-C",
+                repo_arg,
+                "rev-parse",
+                "--verify",
+                "--quiet",
+                f"refs/heads/{branch_name}",
+            ],
+            check=False,
+            stdout=subprocess.DEVNULL,
+        )
+        if verify.returncode == 0:
+            logger.error("Failed to check out %s: %s", branch_name, exc.stderr.strip())
+            raise
 
-    # Create and checkout feature branch
-    if current_branch != branch_name:
-        # Check if branch already exists
-        try:
-            subprocess.run(
-                ["git", "-C", str(repo_path), "rev-parse", "--verify", branch_name],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            # Branch exists, just checkout
-            subprocess.run(
-                ["git", "-C", str(repo_path), "checkout", branch_name], check=True
-            )
-        except subprocess.CalledProcessError:
-            # Branch doesn't exist, create it
-            subprocess.run(
-                ["git", "-C", str(repo_path), "checkout", "-b", branch_name], check=True
-            )
+        subprocess.run(
+            ["git", "-C", repo_arg, "checkout", "-b", branch_name], check=True
+        )
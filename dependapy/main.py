@@ -10,25 +10,34 @@ import sys
 from pathlib import Path
 
 from dependapy.analyzer import scan_repository
+from dependapy.cache import set_cache_dir, set_cache_ttl
 from dependapy.github_api import create_or_update_pull_request
 from dependapy.updater import update_dependencies
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger("dependapy")
 
 
-def main():
-    """Main entry point for dependapy"""
+def _configure_logging(level: int) -> None:
+    """Configure logging for the command line entry point"""
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Main entry point for dependapy
+
+    Parses argv, or sys.argv when it's None, and returns the exit code
+    """
     parser = argparse.ArgumentParser(
         description="Analyze and update Python dependencies"
     )
     parser.add_argument(
         "--repo-path",
-        default=str(Path.cwd()),
+        type=Path,
+        default=Path.cwd(),
         help="Path to the repository to scan (default: current directory)",
     )
     parser.add_argument(
@@ -46,9 +55,52 @@ def main():
         action="store_true",
         help="Don't make any changes, just report what would be changed",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help=(
+            "Directory for cached lookups and analysis results "
+            "(default: DEPENDAPY_CACHE_DIR or ~/.cache/dependapy)"
+        ),
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=None,
+        help=(
+            "Maximum age in seconds of cached lookups and analysis results "
+            "(default: DEPENDAPY_CACHE_TTL or 21600)"
+        ),
+    )
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument(
+        "--quiet",
+        dest="log_level",
+        action="store_const",
+        const=logging.WARNING,
+        default=logging.INFO,
+        help="Only log warnings and errors",
+    )
+    verbosity.add_argument(
+        "--verbose",
+        dest="log_level",
+        action="store_const",
+        const=logging.DEBUG,
+        help="Log debug messages",
+    )
+    args = parser.parse_args(argv)
 
-    repo_path = Path(args.repo_path)
+    # Configured here rather than at import time, so importing dependapy as a
+    # library doesn't touch the root logger
+    _configure_logging(args.log_level)
+
+    if args.cache_dir is not None:
+        set_cache_dir(args.cache_dir)
+    if args.max_age is not None:
+        set_cache_ttl(args.max_age)
+
+    repo_path = args.repo_path
     dry_run = args.dry_run
     create_pr = not args.no_pr and not dry_run
 
@@ -93,6 +145,8 @@ def main():
         logger.exception("Error running dependapy")
         return 1
 
+    return 0
+
 
 if __name__ == "__main__":
     sys.exit(main())
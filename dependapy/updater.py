@@ -2,8 +2,16 @@
 Updater module for updating pyproject.toml files
 """
 
+import functools
+import hashlib
 import logging
+import os
 import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -12,7 +20,7 @@ from dependapy.analyzer import FileAnalysisResult
 logger = logging.getLogger("dependapy.updater")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UpdateResult:
     """Result of updating a pyproject.toml file"""
 
@@ -20,69 +28,219 @@ class UpdateResult:
     modified: bool
 
 
-def update_dependencies(
-    analysis_results: list[FileAnalysisResult],
-) -> list[UpdateResult]:
-    """Update dependencies in pyproject.toml files based on analysis results"""
-    update_results = []
-
-    for result in analysis_results:
-        file_path = result.file_path
-        modified = False
-
+@functools.lru_cache(maxsize=4096)
+def _build_update_pattern(
+    package_names: tuple[str, ...], *, python: bool = False
+) -> re.Pattern[bytes]:
+    """
+    Build one pattern matching a pinned version of any of the packages and,
+    if requested, the requires-python constraint
+    """
+    alternatives = []
+    if python:
+        # Basic and literal TOML strings, with any spacing around "="
+        alternatives.append(
+            rb"(?P<py_prefix>requires-python\s*+=\s*+(?P<py_quote>[\"']))"
+            rb"(?P<py_version>[^\"']*+)(?=(?P=py_quote))"
+        )
+    if package_names:
+        names = "|".join(re.escape(name) for name in package_names).encode()
+        # The lookbehind keeps "sk" from matching inside "flask"; only the
+        # version token is captured, so surrounding quotes are preserved.
+        # Extras and clauses other than the >=/== bound may come first, as
+        # in "uvicorn[standard]<1,>=0.20.0", matching what the analyzer reads.
+        # Possessive quantifiers never give back what they consumed, so a
+        # failed match can't backtrack through runs of whitespace
+        alternatives.append(
+            rb"(?P<prefix>[\"']?(?<![A-Za-z0-9._-])(?P<name>" + names + rb")[\"']?"
+            rb"\s*+(?:\[[^\]]*+\]\s*+)?"
+            rb"(?:(?:===|<=|<|!=|~=|>(?!=))\s*+[^\"'\s,;#\]]++\s*+,\s*+)*+"
+            rb"(?:>=|==(?!=))\s*+)"
+            rb"(?P<version>[^\"'\s,;#\]]++)"
+        )
+    return re.compile(b"|".join(alternatives))
+
+
+def _replace_version(
+    python_constraints: tuple[bytes, bytes] | None,
+    new_versions: dict[bytes, dict[bytes, bytes]],
+    match: re.Match[bytes],
+) -> bytes:
+    """Replace a matched version if it is the one recorded for the update"""
+    # The last group closed tells which alternative matched
+    if match.lastgroup == "py_version":
+        if python_constraints is None or match["py_version"] != python_constraints[0]:
+            return match[0]
+        return match["py_prefix"] + python_constraints[1]
+
+    new_version = new_versions[match["name"]].get(match["version"])
+    if new_version is None:
+        return match[0]
+    return match["prefix"] + new_version
+
+
+def _write_atomic(file_path: Path, content: bytes) -> None:
+    """Replace a file's content so readers never see a partial write"""
+    # Replace a symlink's target rather than the link itself
+    file_path = file_path.resolve()
+    fd, tmp_name = tempfile.mkstemp(
+        dir=file_path.parent, prefix=f".{file_path.name}-", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        # mkstemp creates the file as 0600; keep the original's permissions
+        shutil.copymode(file_path, tmp_name)
+        os.replace(tmp_name, file_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def _rewrite(content: bytes, result: FileAnalysisResult) -> bytes:
+    """Apply the updates of an analysis result to a file's content"""
+    # Collect the Python requirement and package updates so that a single
+    # pass of one pattern rewrites all of them
+    python_constraints = None
+    if result.python_update:
+        current = result.python_update.current_constraint.encode()
+        if current in content:
+            new = result.python_update.recommended_constraint.encode()
+            python_constraints = (current, new)
+
+    new_versions: dict[bytes, dict[bytes, bytes]] = {}
+    for update in result.package_updates:
+        package_name = update.package_name.encode()
+        current_version = update.current_version.encode()
+        # A plain substring search is much cheaper than the regex, so only
+        # hand it packages that can actually match
+        if package_name not in content or current_version not in content:
+            continue
+        versions = new_versions.setdefault(package_name, {})
+        versions[current_version] = update.latest_version.encode()
+
+    if python_constraints is not None or new_versions:
+        # Sorted names give files with the same updates the same pattern
+        package_names = sorted(name.decode() for name in new_versions)
+        pattern = _build_update_pattern(
+            tuple(package_names), python=python_constraints is not None
+        )
+        content = pattern.sub(
+            functools.partial(_replace_version, python_constraints, new_versions),
+            content,
+        )
+
+    return content
+
+
+# Rewritten content keyed by the original content's hash and the updates,
+# so identical files in a monorepo are only rewritten once
+_REWRITE_CACHE: OrderedDict[tuple, bytes] = OrderedDict()
+_REWRITE_CACHE_SIZE = 1024
+_REWRITE_CACHE_LOCK = threading.Lock()
+
+
+def _rewrite_cached(content: bytes, result: FileAnalysisResult) -> bytes:
+    """Rewrite content, reusing the output for identical files and updates"""
+    python_update = result.python_update
+    key = (
+        hashlib.sha256(content).digest(),
+        (
+            (python_update.current_constraint, python_update.recommended_constraint)
+            if python_update
+            else None
+        ),
+        tuple(
+            (update.package_name, update.current_version, update.latest_version)
+            for update in result.package_updates
+        ),
+    )
+    with _REWRITE_CACHE_LOCK:
+        cached = _REWRITE_CACHE.get(key)
+        if cached is not None:
+            _REWRITE_CACHE.move_to_end(key)
+            return cached
+
+    new_content = _rewrite(content, result)
+    with _REWRITE_CACHE_LOCK:
+        _REWRITE_CACHE[key] = new_content
+        if len(_REWRITE_CACHE) > _REWRITE_CACHE_SIZE:
+            _REWRITE_CACHE.popitem(last=False)
+
+    return new_content
+
+
+def _update_one(result: FileAnalysisResult) -> UpdateResult | None:
+    """Apply the updates for one file, returning None if it can't be updated"""
+    file_path = result.file_path
+
+    # Nothing to apply, so don't touch the file at all
+    if not result.python_update and not result.package_updates:
+        return UpdateResult(file_path=file_path, modified=False)
+
+    # Work on raw bytes: every token we edit is ASCII, so decoding and
+    # re-encoding the whole file would be wasted work, and line endings are
+    # left exactly as they were. The scan usually hands over what it read.
+    original_content = result.content
+    if original_content is None:
         try:
-            # Read the current file content
-            with file_path.open("r", encoding="utf-8") as f:
-                content = f.read()
+            original_content = file_path.read_bytes()
         except Exception:
             logger.exception("Failed to read %s", file_path)
-            continue
+            return None
 
-        # Update Python version requirement if needed
+    content = _rewrite_cached(original_content, result)
+
+    # These loops exist only to log, so skip them when INFO is disabled
+    if logger.isEnabledFor(logging.INFO):
         if result.python_update:
-            current = result.python_update.current_constraint
-            new = result.python_update.recommended_constraint
-            content = content.replace(
-                f'requires-python = "{current}"',
-                f'requires-python = "{new}"',
+            logger.info(
+                "Updated Python requirement: %s -> %s",
+                result.python_update.current_constraint,
+                result.python_update.recommended_constraint,
             )
-            logger.info("Updated Python requirement: %s -> %s", current, new)
-            modified = True
-
-        # Update package versions
         for update in result.package_updates:
-            package_name = update.package_name
-            current_version = update.current_version
-            new_version = update.latest_version
-
-            # Pattern to match the current version while preserving indentation and format
-            # We need to ensure we only update the correct dependency
-            pattern = (
-                f"([\"']?{re.escape(package_name)}[\"']?\\s*(?:>=|==)\\s*)"
-                f"[\"']?{re.escape(current_version)}[\"']?"
+            logger.info(
+                "Updated %s: %s -> %s",
+                update.package_name,
+                update.current_version,
+                update.latest_version,
             )
 
-            # Replace with the new version, preserving the capture group
-            def get_replacement(match, version=new_version) -> str:
-                return f"{match.group(1)}{version}"
+    # Write back the file only if an update actually changed it
+    modified = content != original_content
+    if modified:
+        try:
+            _write_atomic(file_path, content)
+            logger.info("Successfully updated %s", file_path)
+        except Exception:
+            logger.exception("Failed to write updated content to %s", file_path)
+            return None
 
-            content = re.sub(pattern, get_replacement, content)
+    return UpdateResult(file_path=file_path, modified=modified)
 
-            logger.info(
-                "Updated %s: %s -> %s", package_name, current_version, new_version
-            )
-            modified = True
 
-        # Write back the file if modifications were made
-        if modified:
-            try:
-                with file_path.open("w", encoding="utf-8") as f:
-                    f.write(content)
-                logger.info("Successfully updated %s", file_path)
-            except Exception:
-                logger.exception("Failed to write updated content to %s", file_path)
-                continue
+# Below this many files, updates are applied without a thread pool
+_MIN_FILES_FOR_POOL = 4
 
-        update_results.append(UpdateResult(file_path=file_path, modified=modified))
 
-    return update_results
+def update_dependencies(
+    analysis_results: list[FileAnalysisResult],
+) -> list[UpdateResult]:
+    """Update dependencies in pyproject.toml files based on analysis results"""
+    if len(analysis_results) < _MIN_FILES_FOR_POOL:
+        # Starting threads costs more than it saves for a handful of files
+        return [
+            update_result
+            for update_result in map(_update_one, analysis_results)
+            if update_result is not None
+        ]
+
+    # Files are independent, so their reads, rewrites and writes can overlap;
+    # map() keeps the results in the order of analysis_results
+    with ThreadPoolExecutor(max_workers=min(32, len(analysis_results))) as executor:
+        return [
+            update_result
+            for update_result in executor.map(_update_one, analysis_results)
+            if update_result is not None
+        ]
@@ -0,0 +1,38 @@
+"""Shared fixtures for the dependapy tests"""
+
+import pytest
+
+from dependapy.analyzer import (
+    _PYPI_CACHE,
+    _PYTHON_VERSIONS_CACHE,
+    _SCAN_CACHE,
+    UpdateInfo,
+)
+
+_CACHES = (_PYPI_CACHE, _PYTHON_VERSIONS_CACHE, _SCAN_CACHE)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep on-disk caches inside the test's temporary directory"""
+    monkeypatch.setenv("DEPENDAPY_CACHE_DIR", str(tmp_path / "cache"))
+    for cache in _CACHES:
+        cache.reset()
+    yield
+    for cache in _CACHES:
+        cache.reset()
+
+
+@pytest.fixture(scope="session")
+def make_update_info():
+    """Build UpdateInfo objects, defaulting to a requests 2.25.0 -> 2.31.0 bump"""
+    defaults = {
+        "package_name": "requests",
+        "current_version": "2.25.0",
+        "latest_version": "2.31.0",
+    }
+
+    def _make(file_path, **overrides):
+        return UpdateInfo(file_path=file_path, **{**defaults, **overrides})
+
+    return _make
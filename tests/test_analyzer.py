@@ -1,10 +1,19 @@
 """Tests for the analyzer module of dependapy"""
 
-import tempfile
-from pathlib import Path
+import hashlib
+import json
+import time
+import tomllib
+from types import SimpleNamespace
 from unittest import mock
 
+import pytest
+
 from dependapy.analyzer import (
+    _PYPI_CACHE,
+    _SCAN_CACHE,
+    _iter_pyproject,
+    _latest_version_from_files,
     get_latest_python_versions,
     get_latest_version,
     get_min_python_version,
@@ -13,6 +22,8 @@ from dependapy.analyzer import (
     scan_repository,
 )
 
+pytestmark = pytest.mark.unit
+
 
 def test_parse_dependency_version():
     """Test the parse_dependency_version function"""
@@ -36,27 +47,47 @@ def test_parse_dependency_version():
     assert package == "requests"
     assert version == ""
 
+    # Test with extras, markers and additional constraints
+    package, version = parse_dependency_version(
+        'uvicorn[standard]>=0.20.0,<1.0; python_version >= "3.8"'
+    )
+    assert package == "uvicorn"
+    assert version == "0.20.0"
+
+    # Test with operators that don't pin a minimum version
+    assert parse_dependency_version("requests~=2.25") == ("requests", "")
+    assert parse_dependency_version("requests!=2.26.0") == ("requests", "")
+
 
-def test_get_min_python_version():
+@pytest.mark.parametrize(
+    ("constraint", "expected"),
+    [
+        (">=3.8", "3.8"),
+        (">=3.8,<4.0", "3.8"),
+        (">=3.8.0", "3.8"),
+        ("<4.0", None),
+        ("~=3.8", None),
+        ("invalid_constraint", None),
+    ],
+)
+def test_get_min_python_version(constraint, expected):
     """Test the get_min_python_version function"""
-    assert get_min_python_version(">=3.8") == "3.8"
-    assert get_min_python_version(">=3.8,<4.0") == "3.8"
-    assert get_min_python_version(">=3.8.0") == "3.8"
-    assert get_min_python_version("<4.0") is None
-    assert get_min_python_version("~=3.8") is None
+    assert get_min_python_version(constraint) == expected
 
 
-@mock.patch("dependapy.analyzer.requests.get")
+@mock.patch("dependapy.analyzer._SESSION.get")
 def test_get_latest_python_versions(mock_get):
     """Test the get_latest_python_versions function with mocked API response"""
     # Mock API response
     mock_response = mock.Mock()
-    mock_response.json.return_value = [
-        {"cycle": "3.12", "eol": "2028-10-02"},
-        {"cycle": "3.11", "eol": "2027-10-24"},
-        {"cycle": "3.10", "eol": "2026-10-04"},
-        {"cycle": "3.9", "eol": "2025-10-05"},
-    ]
+    mock_response.content = json.dumps(
+        [
+            {"cycle": "3.12", "eol": "2028-10-02"},
+            {"cycle": "3.11", "eol": "2027-10-24"},
+            {"cycle": "3.10", "eol": "2026-10-04"},
+            {"cycle": "3.9", "eol": "2025-10-05"},
+        ]
+    ).encode()
     mock_response.raise_for_status.return_value = None
     mock_get.return_value = mock_response
 
@@ -64,20 +95,36 @@ def test_get_latest_python_versions(mock_get):
     assert versions == ["3.12", "3.11", "3.10"]
     mock_get.assert_called_with("https://endoflife.date/api/python.json", timeout=10)
 
+    # The next call is served from the cache
+    assert get_latest_python_versions() == versions
+    mock_get.assert_called_once()
 
-@mock.patch("dependapy.analyzer.requests.get")
+
+@mock.patch("dependapy.analyzer._SESSION.get")
 def test_get_latest_version(mock_get):
     """Test the get_latest_version function with mocked PyPI response"""
     # Mock PyPI response
     mock_response = mock.Mock()
-    mock_response.json.return_value = {"info": {"version": "2.31.0"}}
+    mock_response.content = json.dumps(
+        {
+            "files": [
+                {"filename": "requests-2.30.0.tar.gz", "yanked": False},
+                {"filename": "requests-2.31.0-py3-none-any.whl", "yanked": False},
+                {"filename": "requests-2.31.0.tar.gz", "yanked": False},
+            ]
+        }
+    ).encode()
     mock_response.status_code = 200
     mock_response.raise_for_status.return_value = None
     mock_get.return_value = mock_response
 
     version = get_latest_version("requests")
     assert version == "2.31.0"
-    mock_get.assert_called_with("https://pypi.org/pypi/requests/json", timeout=10)
+    mock_get.assert_called_with(
+        "https://pypi.org/simple/requests/",
+        headers={"Accept": "application/vnd.pypi.simple.v1+json"},
+        timeout=10,
+    )
 
     # Test caching
     version = get_latest_version("requests")
@@ -86,12 +133,51 @@ def test_get_latest_version(mock_get):
     assert mock_get.call_count == 1
 
 
-def test_scan_file():
+@mock.patch("dependapy.analyzer._SESSION.get")
+def test_get_latest_version_falls_back_to_json_api(mock_get):
+    """Test using the JSON API when no index file name can be parsed"""
+    simple_response = mock.Mock(status_code=200)
+    simple_response.content = json.dumps(
+        {"files": [{"filename": "legacy-1.0-py2.7.egg", "yanked": False}]}
+    ).encode()
+    json_response = mock.Mock(status_code=200)
+    json_response.content = json.dumps({"info": {"version": "1.0"}}).encode()
+    mock_get.side_effect = [simple_response, json_response]
+
+    assert get_latest_version("legacy") == "1.0"
+    assert mock_get.call_args.args == ("https://pypi.org/pypi/legacy/json",)
+
+    # A version that isn't PEP 440 is dropped rather than compared later
+    simple_response.content = json.dumps(
+        {"files": [{"filename": "older-2004d.win32.exe", "yanked": False}]}
+    ).encode()
+    json_response.content = json.dumps({"info": {"version": "2004d"}}).encode()
+    mock_get.side_effect = [simple_response, json_response]
+
+    assert get_latest_version("older") is None
+
+
+def test_latest_version_from_files():
+    """Test picking the latest release from simple index file entries"""
+    files = [
+        {"filename": "pkg-1.0.0.tar.gz", "yanked": False},
+        {"filename": "pkg-1.1.0-py3-none-any.whl", "yanked": False},
+        {"filename": "pkg-1.2.0-py3-none-any.whl", "yanked": "broken release"},
+        {"filename": "pkg-2.0.0rc1.tar.gz", "yanked": False},
+        {"filename": "pkg-0.9-py2.7.egg", "yanked": False},
+    ]
+    assert _latest_version_from_files(files) == "1.1.0"
+
+    # Pre-releases count when there are no final releases
+    assert _latest_version_from_files(files[3:4]) == "2.0.0rc1"
+    assert _latest_version_from_files([]) is None
+
+
+def test_scan_file(tmp_path, mocker):
     """Test scanning a pyproject.toml file with mock data"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        test_file = Path(tmpdir) / "pyproject.toml"
-        with open(test_file, "w") as f:
-            f.write("""
+    test_file = tmp_path / "pyproject.toml"
+    with open(test_file, "w") as f:
+        f.write("""
 [build-system]
 requires = ["setuptools>=61.0"]
 build-backend = "setuptools.build_meta"
@@ -104,86 +190,257 @@ dependencies = [
     "requests>=2.25.0",
     "packaging>=23.0",
 ]
-            """)
+        """)
 
-        # Mock the latest Python versions and get_latest_version function
-        with mock.patch(
-            "dependapy.analyzer.get_latest_python_versions"
-        ) as mock_py_versions:
-            with mock.patch(
-                "dependapy.analyzer.get_latest_version"
-            ) as mock_get_version:
-                mock_py_versions.return_value = ["3.12", "3.11", "3.10"]
-                mock_get_version.side_effect = lambda pkg: {
-                    "requests": "2.31.0",
-                    "packaging": "23.2",
-                }[pkg]
-
-                result = scan_file(test_file, ["3.12", "3.11", "3.10"])
-
-                # First ensure result is not None
-                assert result is not None, "scan_file returned None"
-
-                # Should require Python version update
-                assert result.python_update is not None
-                assert result.python_update.current_constraint == ">=3.8"
-                assert result.python_update.recommended_constraint == ">=3.10"
-
-                # Should have two package updates
-                assert len(result.package_updates) == 2
-                assert any(
-                    update.package_name == "requests"
-                    and update.current_version == "2.25.0"
-                    and update.latest_version == "2.31.0"
-                    for update in result.package_updates
-                )
-                assert any(
-                    update.package_name == "packaging"
-                    and update.current_version == "23.0"
-                    and update.latest_version == "23.2"
-                    for update in result.package_updates
-                )
-
-
-def test_scan_repository():
+    # Mock the latest Python versions and get_latest_version function
+    mock_py_versions = mocker.patch("dependapy.analyzer.get_latest_python_versions")
+    mock_get_version = mocker.patch("dependapy.analyzer.get_latest_version")
+    mock_py_versions.return_value = ["3.12", "3.11", "3.10"]
+    mock_get_version.side_effect = lambda pkg: {
+        "requests": "2.31.0",
+        "packaging": "23.2",
+    }[pkg]
+
+    result = scan_file(test_file, ["3.12", "3.11", "3.10"])
+
+    # First ensure result is not None
+    assert result is not None, "scan_file returned None"
+
+    # Should require Python version update
+    assert result.python_update is not None
+    assert result.python_update.current_constraint == ">=3.8"
+    assert result.python_update.recommended_constraint == ">=3.10"
+
+    # Should have two package updates
+    assert len(result.package_updates) == 2
+    assert any(
+        update.package_name == "requests"
+        and update.current_version == "2.25.0"
+        and update.latest_version == "2.31.0"
+        for update in result.package_updates
+    )
+    assert any(
+        update.package_name == "packaging"
+        and update.current_version == "23.0"
+        and update.latest_version == "23.2"
+        for update in result.package_updates
+    )
+
+
+def test_scan_file_uses_prefetched_versions(tmp_path):
+    """Test that prefetched versions are used instead of PyPI lookups"""
+    test_file = tmp_path / "pyproject.toml"
+    test_file.write_text(
+        '[project]\nname = "p"\n'
+        'dependencies = ["requests>=2.25.0", "packaging>=23.0"]\n'
+    )
+
+    with mock.patch(
+        "dependapy.analyzer.get_latest_version", return_value="24.0"
+    ) as mock_get_version:
+        result = scan_file(test_file, ["3.12", "3.11", "3.10"], {"requests": "2.31.0"})
+
+    assert result is not None
+    latest = {u.package_name: u.latest_version for u in result.package_updates}
+    assert latest == {"requests": "2.31.0", "packaging": "24.0"}
+    # Only the package missing from the prefetched versions is looked up
+    mock_get_version.assert_called_once_with("packaging")
+
+
+def test_scan_repository(tmp_path, mocker):
     """Test scanning a repository with mock pyproject.toml files"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        repo_path = Path(tmpdir)
+    repo_path = tmp_path
 
-        # Create a few pyproject.toml files in different directories
-        (repo_path / "project1").mkdir()
-        with open(repo_path / "project1" / "pyproject.toml", "w") as f:
-            f.write("""
+    # Create a few pyproject.toml files in different directories
+    (repo_path / "project1").mkdir()
+    with open(repo_path / "project1" / "pyproject.toml", "w") as f:
+        f.write("""
 [project]
 name = "project1"
 version = "0.1.0"
 requires-python = ">=3.10"
 dependencies = ["requests>=2.31.0"]
-            """)
+        """)
 
-        (repo_path / "project2").mkdir()
-        with open(repo_path / "project2" / "pyproject.toml", "w") as f:
-            f.write("""
+    (repo_path / "project2").mkdir()
+    with open(repo_path / "project2" / "pyproject.toml", "w") as f:
+        f.write("""
 [project]
 name = "project2"
 version = "0.1.0"
 requires-python = ">=3.8"
 dependencies = ["requests>=2.25.0"]
-            """)
+        """)
+
+    # Mock functions
+    mock_py_versions = mocker.patch("dependapy.analyzer.get_latest_python_versions")
+    mock_scan = mocker.patch("dependapy.analyzer.scan_file")
+    mock_fetch = mocker.patch("dependapy.analyzer.get_latest_version")
+    mock_py_versions.return_value = ["3.12", "3.11", "3.10"]
+
+    # Mock only project2 needing updates
+    mock_scan.side_effect = lambda file_path, *_: (
+        None if "project1" in str(file_path) else SimpleNamespace()
+    )
+
+    results = scan_repository(repo_path)
+    assert len(results) == 1  # Only project2 should need updates
+
+    # Package lookups are deduplicated across files
+    mock_fetch.assert_called_once_with("requests")
 
-        # Mock functions
+
+def test_iter_pyproject_skips_ignored_dirs(tmp_path):
+    """Test that VCS, virtualenv and build directories are not scanned"""
+    for directory in ["", "pkg", ".venv/lib", ".git", "node_modules/dep", "build"]:
+        (tmp_path / directory).mkdir(parents=True, exist_ok=True)
+        (tmp_path / directory / "pyproject.toml").write_text("[project]\n")
+
+    found = sorted(_iter_pyproject(tmp_path))
+    assert found == [tmp_path / "pkg" / "pyproject.toml", tmp_path / "pyproject.toml"]
+
+
+def test_scan_repository_parses_each_file_once(tmp_path):
+    """Test that the prefetch pass and scan_file share the parsed TOML"""
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\nname = "p"\ndependencies = ["requests>=2.31.0"]\n'
+    )
+
+    with (
+        mock.patch(
+            "dependapy.analyzer.get_latest_python_versions",
+            return_value=["3.12", "3.11", "3.10"],
+        ),
+        mock.patch("dependapy.analyzer.get_latest_version", return_value="2.31.0"),
+        mock.patch(
+            "dependapy.analyzer.tomllib.loads", wraps=tomllib.loads
+        ) as mock_loads,
+    ):
+        assert scan_repository(tmp_path) == []
+
+    mock_loads.assert_called_once()
+
+
+def test_scan_repository_skips_cached_packages(tmp_path):
+    """Test that packages already in the PyPI cache are not fetched again"""
+    (tmp_path / "pyproject.toml").write_text(
+        "[project]\n"
+        'name = "p"\n'
+        'dependencies = ["requests>=2.31.0", "flask>=3.0.0", "django"]\n'
+    )
+    _PYPI_CACHE["requests"] = "2.31.0"
+
+    mock_response = mock.Mock(status_code=200)
+    mock_response.content = json.dumps(
+        {"files": [{"filename": "flask-3.0.0.tar.gz", "yanked": False}]}
+    ).encode()
+
+    with (
+        mock.patch(
+            "dependapy.analyzer.get_latest_python_versions",
+            return_value=["3.12", "3.11", "3.10"],
+        ),
+        mock.patch(
+            "dependapy.analyzer._SESSION.get", return_value=mock_response
+        ) as mock_get,
+    ):
+        assert scan_repository(tmp_path) == []
+
+    # django has no version to compare, requests is served from the cache
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.args == ("https://pypi.org/simple/flask/",)
+
+
+def test_scan_repository_reuses_cached_analysis(tmp_path):
+    """Test that unchanged files are not parsed or looked up again"""
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\nname = "p"\ndependencies = ["requests>=2.25.0"]\n'
+    )
+
+    mock_response = mock.Mock(status_code=200)
+    mock_response.content = json.dumps(
+        {"files": [{"filename": "requests-2.31.0.tar.gz", "yanked": False}]}
+    ).encode()
+
+    with (
+        mock.patch(
+            "dependapy.analyzer.get_latest_python_versions",
+            return_value=["3.12", "3.11", "3.10"],
+        ),
+        mock.patch(
+            "dependapy.analyzer._SESSION.get", return_value=mock_response
+        ) as mock_get,
+    ):
+        first = scan_repository(tmp_path)
         with mock.patch(
-            "dependapy.analyzer.get_latest_python_versions"
-        ) as mock_py_versions:
-            with mock.patch("dependapy.analyzer.scan_file") as mock_scan:
-                mock_py_versions.return_value = ["3.12", "3.11", "3.10"]
-
-                # Mock only project2 needing updates
-                mock_scan.side_effect = (
-                    lambda file_path, _: None
-                    if "project1" in str(file_path)
-                    else mock.MagicMock()
-                )
-
-                results = scan_repository(repo_path)
-                assert len(results) == 1  # Only project2 should need updates
+            "dependapy.analyzer.tomllib.loads", wraps=tomllib.loads
+        ) as mock_loads:
+            second = scan_repository(tmp_path)
+
+    assert second == first
+    assert second[0].package_updates[0].latest_version == "2.31.0"
+    mock_loads.assert_not_called()
+    assert mock_get.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [
+        {"versions": ["3.12", "3.11", "3.10"]},
+        ["3.12", "3.11", "3.10"],
+        {"python_versions": ["3.12", "3.11", "3.10"], "result": {"updates": []}},
+        {
+            "python_versions": ["3.12", "3.11", "3.10"],
+            "result": {"package_updates": [["requests"]], "python_update": None},
+        },
+    ],
+    ids=["missing_key", "list", "old_result_format", "short_update"],
+)
+def test_scan_repository_ignores_malformed_cached_analysis(tmp_path, entry):
+    """Test that a scan cache entry in another format is treated as a miss"""
+    content = b'[project]\nname = "p"\ndependencies = ["requests>=2.25.0"]\n'
+    (tmp_path / "pyproject.toml").write_bytes(content)
+    _SCAN_CACHE[hashlib.sha256(content).hexdigest()] = entry
+    _PYPI_CACHE["requests"] = "2.31.0"
+
+    with mock.patch(
+        "dependapy.analyzer.get_latest_python_versions",
+        return_value=["3.12", "3.11", "3.10"],
+    ):
+        results = scan_repository(tmp_path)
+
+    assert results[0].package_updates[0].latest_version == "2.31.0"
+
+
+def test_scan_repository_dates_cached_analysis_by_oldest_lookup(tmp_path):
+    """Test that a cached analysis expires with the PyPI data it was made from"""
+    content = b'[project]\nname = "p"\ndependencies = ["requests>=2.25.0"]\n'
+    (tmp_path / "pyproject.toml").write_bytes(content)
+    fetched_at = time.time() - 60 * 60
+    _PYPI_CACHE.set("requests", "2.31.0", fetched_at=fetched_at)
+
+    with mock.patch(
+        "dependapy.analyzer.get_latest_python_versions",
+        return_value=["3.12", "3.11", "3.10"],
+    ):
+        scan_repository(tmp_path)
+
+    assert _SCAN_CACHE.fetched_at(hashlib.sha256(content).hexdigest()) == fetched_at
+
+
+def test_scan_repository_skips_files_without_dependencies(tmp_path):
+    """Test that files with nothing to update are not parsed"""
+    (tmp_path / "pyproject.toml").write_text("[tool.ruff]\nline-length = 88\n")
+
+    with (
+        mock.patch(
+            "dependapy.analyzer.get_latest_python_versions",
+            return_value=["3.12", "3.11", "3.10"],
+        ),
+        mock.patch(
+            "dependapy.analyzer.tomllib.loads", wraps=tomllib.loads
+        ) as mock_loads,
+    ):
+        assert scan_repository(tmp_path) == []
+
+    mock_loads.assert_not_called()
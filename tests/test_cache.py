@@ -0,0 +1,126 @@
+"""Tests for the cache module of dependapy"""
+
+import json
+import time
+from unittest import mock
+
+import pytest
+
+from dependapy.cache import JsonCache, get_cache_dir, get_cache_ttl, set_cache_ttl
+
+pytestmark = pytest.mark.unit
+
+
+def test_cache_persists_between_instances():
+    """Test that flushed entries are visible to a fresh cache"""
+    cache = JsonCache("test")
+    cache["requests"] = "2.31.0"
+    cache["missing-package"] = None
+    cache.flush()
+
+    reloaded = JsonCache("test")
+    assert "requests" in reloaded
+    assert reloaded["requests"] == "2.31.0"
+    assert reloaded["missing-package"] is None
+
+
+def test_cache_drops_expired_entries(monkeypatch):
+    """Test that entries older than the TTL are not loaded"""
+    monkeypatch.setenv("DEPENDAPY_CACHE_TTL", "60")
+    cache_dir = get_cache_dir()
+    cache_dir.mkdir(parents=True)
+    (cache_dir / "test.json").write_text(
+        json.dumps(
+            {
+                "fresh": ["1.0.0", time.time()],
+                "stale": ["1.0.0", time.time() - 120],
+            }
+        )
+    )
+
+    cache = JsonCache("test")
+    assert "fresh" in cache
+    assert "stale" not in cache
+
+
+def test_cache_ignores_corrupt_file():
+    """Test that an unreadable cache file is treated as empty"""
+    cache_dir = get_cache_dir()
+    cache_dir.mkdir(parents=True)
+    (cache_dir / "test.json").write_text("not json")
+
+    cache = JsonCache("test")
+    assert "requests" not in cache
+
+
+@pytest.mark.parametrize(
+    "content",
+    ['{"requests": "2.31.0"}', "[]", '{"requests": ["2.31.0", "yesterday"]}'],
+    ids=["bare_value", "list", "bad_timestamp"],
+)
+def test_cache_ignores_malformed_entries(content):
+    """Test that valid JSON of the wrong shape is treated as empty"""
+    cache_dir = get_cache_dir()
+    cache_dir.mkdir(parents=True)
+    (cache_dir / "test.json").write_text(content)
+
+    cache = JsonCache("test")
+    assert "requests" not in cache
+
+
+def test_cache_flush_failure_removes_temp_file(monkeypatch):
+    """Test that a failed write leaves no temp file in the cache directory"""
+    cache = JsonCache("test")
+    cache["requests"] = "2.31.0"
+    monkeypatch.setattr("dependapy.cache.os.replace", mock.Mock(side_effect=OSError))
+
+    cache.flush()
+
+    assert list(get_cache_dir().iterdir()) == []
+
+
+def test_cache_ttl_override(monkeypatch):
+    """Test that a TTL set from the command line wins over the environment"""
+    monkeypatch.setenv("DEPENDAPY_CACHE_TTL", "60")
+    # Restored by monkeypatch so the override doesn't leak into other tests
+    monkeypatch.setattr("dependapy.cache._cache_ttl_override", None)
+
+    assert get_cache_ttl() == 60
+    set_cache_ttl(3600)
+    assert get_cache_ttl() == 3600
+
+
+def test_cache_fixed_ttl_bounded_by_configured_ttl(monkeypatch):
+    """Test that a cache's own TTL applies unless a shorter one is configured"""
+    cache_dir = get_cache_dir()
+    cache_dir.mkdir(parents=True)
+    (cache_dir / "test.json").write_text(
+        json.dumps({"latest": [["3.13"], time.time() - 12 * 60 * 60]})
+    )
+    monkeypatch.setattr("dependapy.cache._cache_ttl_override", None)
+
+    cache = JsonCache("test", ttl=24 * 60 * 60)
+    assert "latest" in cache
+
+    set_cache_ttl(0)
+    cache.reset()
+    assert "latest" not in cache
+
+
+def test_cache_disabled_by_environment(monkeypatch):
+    """Test that DEPENDAPY_NO_CACHE neither reads nor writes the cache file"""
+    cache = JsonCache("test")
+    cache["requests"] = "2.31.0"
+    cache.flush()
+
+    monkeypatch.setenv("DEPENDAPY_NO_CACHE", "1")
+    uncached = JsonCache("test")
+    assert "requests" not in uncached
+    uncached["flask"] = "3.0.0"
+    assert uncached["flask"] == "3.0.0"
+    uncached.flush()
+
+    monkeypatch.delenv("DEPENDAPY_NO_CACHE")
+    reloaded = JsonCache("test")
+    assert "requests" in reloaded
+    assert "flask" not in reloaded
@@ -0,0 +1,168 @@
+"""Tests for the github_api module of dependapy"""
+
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from dependapy.github_api import (
+    _get_repo_info_cached,
+    create_pr_with_gh_cli,
+    create_pr_with_pygithub,
+    get_repo_info,
+    git_add,
+    setup_git_for_commit,
+)
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(autouse=True)
+def clear_repo_info_cache():
+    """Reset memoized repository lookups between tests"""
+    _get_repo_info_cached.cache_clear()
+    yield
+    _get_repo_info_cached.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "remote_url",
+    [
+        "git@github.com:owner/repo.git",
+        "https://github.com/owner/repo.git",
+        "https://github.com/owner/repo",
+        "https://github.com/owner/repo/",
+    ],
+)
+def test_get_repo_info(remote_url):
+    """Test parsing owner and repo from SSH and HTTPS remotes"""
+    with mock.patch(
+        "dependapy.github_api.subprocess.check_output", return_value=remote_url
+    ):
+        assert get_repo_info(Path("/repo")) == ("owner", "repo")
+
+
+def test_get_repo_info_non_github_remote():
+    """Test that non-GitHub remotes are not recognized"""
+    with mock.patch(
+        "dependapy.github_api.subprocess.check_output",
+        return_value="https://gitlab.com/owner/repo.git",
+    ):
+        assert get_repo_info(Path("/repo")) == (None, None)
+
+
+def test_get_repo_info_is_cached():
+    """Test that the git remote is only queried once per repository"""
+    with mock.patch(
+        "dependapy.github_api.subprocess.check_output",
+        return_value="git@github.com:owner/repo.git",
+    ) as mock_check_output:
+        get_repo_info(Path("/repo"))
+        get_repo_info(Path("/repo"))
+
+    mock_check_output.assert_called_once()
+
+
+def test_git_add_batches_files():
+    """Test that files are staged with a single git call per batch"""
+    files = [Path(f"/repo/pkg{i}/pyproject.toml") for i in range(5)]
+
+    with (
+        mock.patch("dependapy.github_api._GIT_ADD_BATCH_SIZE", 2),
+        mock.patch("dependapy.github_api.subprocess.run") as mock_run,
+    ):
+        git_add(Path("/repo"), files)
+
+    assert mock_run.call_count == 3
+    assert mock_run.call_args_list[0] == mock.call(
+        ["git", "-C", "/repo", "add", "--", str(files[0]), str(files[1])],
+        check=True,
+    )
+
+
+def test_setup_git_for_commit_creates_missing_branch():
+    """Test that the branch is created when checking it out finds none"""
+    checkout_error = subprocess.CalledProcessError(
+        1, "git", stderr="error: pathspec 'dependapy/updates' did not match"
+    )
+
+    with mock.patch("dependapy.github_api.subprocess.run") as mock_run:
+        mock_run.side_effect = [checkout_error, mock.Mock(returncode=1), mock.Mock()]
+        setup_git_for_commit(Path("/repo"), "dependapy/updates")
+
+    assert mock_run.call_args == mock.call(
+        ["git", "-C", "/repo", "checkout", "-b", "dependapy/updates"], check=True
+    )
+
+
+def test_setup_git_for_commit_reraises_checkout_failure():
+    """Test that a failed checkout of an existing branch is not hidden"""
+    checkout_error = subprocess.CalledProcessError(
+        1, "git", stderr="error: Your local changes would be overwritten"
+    )
+
+    with mock.patch("dependapy.github_api.subprocess.run") as mock_run:
+        mock_run.side_effect = [checkout_error, mock.Mock(returncode=0)]
+        with pytest.raises(subprocess.CalledProcessError):
+            setup_git_for_commit(Path("/repo"), "dependapy/updates")
+
+    assert mock_run.call_count == 2
+
+
+def test_create_pr_with_pygithub_reuses_existing_pr():
+    """Test that an open PR for the branch is looked up by head and reused"""
+    existing_pr = SimpleNamespace(number=7, html_url="https://github.com/o/r/pull/7")
+
+    with (
+        mock.patch("dependapy.github_api.get_repo_info", return_value=("o", "r")),
+        mock.patch("dependapy.github_api.setup_git_for_commit"),
+        mock.patch("dependapy.github_api.git_add"),
+        mock.patch(
+            "dependapy.github_api.subprocess.check_output",
+            return_value=" M pyproject.toml",
+        ),
+        mock.patch("dependapy.github_api.subprocess.run"),
+        mock.patch("github.Github") as mock_github,
+    ):
+        repo = mock_github.return_value.get_repo.return_value
+        repo.get_pulls.return_value = [existing_pr]
+
+        pr_url = create_pr_with_pygithub(
+            repo_path=Path("/repo"),
+            branch_name="dependapy/updates",
+            updated_files=[Path("/repo/pyproject.toml")],
+            github_token="fake-token",
+        )
+
+    assert pr_url == "https://github.com/o/r/pull/7"
+    repo.get_pulls.assert_called_once_with(state="open", head="o:dependapy/updates")
+    repo.create_pull.assert_not_called()
+
+
+def test_create_pr_with_gh_cli_reuses_existing_pr():
+    """Test that the existing PR URL comes from a single gh pr list call"""
+    with (
+        mock.patch("dependapy.github_api.setup_git_for_commit"),
+        mock.patch("dependapy.github_api.git_add"),
+        mock.patch(
+            "dependapy.github_api.subprocess.check_output",
+            return_value=" M pyproject.toml",
+        ),
+        mock.patch("dependapy.github_api.subprocess.run") as mock_run,
+    ):
+        mock_run.return_value.stdout = '[{"number": 3, "url": "https://pr/3"}]'
+
+        pr_url = create_pr_with_gh_cli(
+            repo_path=Path("/repo"),
+            branch_name="dependapy/updates",
+            updated_files=[Path("/repo/pyproject.toml")],
+            github_token="fake-token",
+        )
+
+    assert pr_url == "https://pr/3"
+    gh_commands = [
+        c.args[0][:3] for c in mock_run.call_args_list if c.args[0][0] == "gh"
+    ]
+    assert gh_commands == [["gh", "pr", "list"]]
@@ -1,29 +1,27 @@
 """Integration test for dependapy"""
 
 import os
-import tempfile
-from pathlib import Path
 from unittest import mock
 
 import pytest
 
 from dependapy.analyzer import scan_repository
 from dependapy.github_api import create_or_update_pull_request
+from dependapy.main import main
 from dependapy.updater import update_dependencies
 
 
 @pytest.fixture
-def sample_repo():
+def sample_repo(tmp_path):
     """Create a temporary repository with sample pyproject.toml files"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        repo_path = Path(tmpdir)
+    repo_path = tmp_path / "repo"
 
-        # Create .git directory to simulate a Git repository
-        os.makedirs(repo_path / ".git")
+    # Create .git directory to simulate a Git repository
+    os.makedirs(repo_path / ".git")
 
-        # Create main project pyproject.toml
-        with open(repo_path / "pyproject.toml", "w") as f:
-            f.write("""
+    # Create main project pyproject.toml
+    with open(repo_path / "pyproject.toml", "w") as f:
+        f.write("""
 [build-system]
 requires = ["hatchling"]
 build-backend = "hatchling.build"
@@ -36,12 +34,12 @@ dependencies = [
     "requests>=2.25.0",
     "packaging>=20.0",
 ]
-            """)
+        """)
 
-        # Create sub-project with its own pyproject.toml
-        os.makedirs(repo_path / "subproject")
-        with open(repo_path / "subproject" / "pyproject.toml", "w") as f:
-            f.write("""
+    # Create sub-project with its own pyproject.toml
+    os.makedirs(repo_path / "subproject")
+    with open(repo_path / "subproject" / "pyproject.toml", "w") as f:
+        f.write("""
 [build-system]
 requires = ["setuptools>=61.0"]
 build-backend = "setuptools.build_meta"
@@ -53,25 +51,33 @@ requires-python = ">=3.9"
 dependencies = [
     "flask>=2.0.0",
 ]
-            """)
-
-        yield repo_path
-
-
-@mock.patch("dependapy.analyzer.get_latest_python_versions")
-@mock.patch("dependapy.analyzer.get_latest_version")
-def test_full_workflow_without_pr(mock_get_version, mock_py_versions, sample_repo):
+        """)
+
+    return repo_path
+
+
+@pytest.fixture(autouse=True)
+def mock_lookups():
+    """Serve Python and package versions without network access"""
+    with (
+        mock.patch(
+            "dependapy.analyzer.get_latest_python_versions",
+            return_value=["3.12", "3.11", "3.10"],
+        ),
+        mock.patch(
+            "dependapy.analyzer.get_latest_version",
+            side_effect=lambda pkg: {
+                "requests": "2.31.0",
+                "packaging": "23.2",
+                "flask": "2.3.3",
+            }[pkg],
+        ),
+    ):
+        yield
+
+
+def test_full_workflow_without_pr(sample_repo):
     """Test the full workflow without creating a PR"""
-    # Mock the latest Python versions
-    mock_py_versions.return_value = ["3.12", "3.11", "3.10"]
-
-    # Mock package versions
-    mock_get_version.side_effect = lambda pkg: {
-        "requests": "2.31.0",
-        "packaging": "23.2",
-        "flask": "2.3.3",
-    }[pkg]
-
     # Step 1: Scan the repository
     analysis_results = scan_repository(sample_repo)
     assert len(analysis_results) == 2  # Should find two pyproject.toml files
@@ -98,28 +104,22 @@ def test_full_workflow_without_pr(mock_get_version, mock_py_versions, sample_rep
         assert any(["flask>=2.3.3" in sub_content, '"flask>=2.3.3"' in sub_content])
 
 
-@mock.patch("dependapy.analyzer.get_latest_python_versions")
-@mock.patch("dependapy.analyzer.get_latest_version")
-@mock.patch("dependapy.github_api.create_pr_with_pygithub")
-def test_full_workflow_with_pr_mock(
-    mock_create_pr,
-    mock_get_version,
-    mock_py_versions,
-    sample_repo,
-):
-    """Test the full workflow with PR creation using mocks"""
-    # Mock the latest Python versions
-    mock_py_versions.return_value = ["3.12", "3.11", "3.10"]
+def test_cli_without_pr(sample_repo):
+    """Test running the command line entry point in-process"""
+    exit_code = main(["--repo-path", str(sample_repo), "--no-pr", "--quiet"])
+    assert exit_code == 0
+
+    sub_content = (sample_repo / "subproject" / "pyproject.toml").read_text()
+    assert '"flask>=2.3.3"' in sub_content
 
-    # Mock package versions
-    mock_get_version.side_effect = lambda pkg: {
-        "requests": "2.31.0",
-        "packaging": "23.2",
-        "flask": "2.3.3",
-    }[pkg]
 
+def test_full_workflow_with_pr_mock(sample_repo, mocker):
+    """Test the full workflow with PR creation using mocks"""
     # Mock PR creation
-    mock_create_pr.return_value = "https://github.com/user/repo/pull/1"
+    mock_create_pr = mocker.patch(
+        "dependapy.github_api.create_pr_with_pygithub",
+        return_value="https://github.com/user/repo/pull/1",
+    )
 
     # Step 1: Scan the repository
     analysis_results = scan_repository(sample_repo)
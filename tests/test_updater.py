@@ -1,20 +1,18 @@
 """Tests for the updater module of dependapy"""
 
-import tempfile
+import tomllib
 from pathlib import Path
+from unittest import mock
 
-from dependapy.analyzer import FileAnalysisResult, PythonVersionUpdateInfo, UpdateInfo
-from dependapy.updater import update_dependencies
+import pytest
 
+from dependapy import updater
+from dependapy.analyzer import FileAnalysisResult, PythonVersionUpdateInfo
+from dependapy.updater import UpdateResult, update_dependencies
 
-def test_update_dependencies():
-    """Test updating dependencies in pyproject.toml files"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        test_file = Path(tmpdir) / "pyproject.toml"
+pytestmark = pytest.mark.unit
 
-        # Create a test pyproject.toml file
-        with open(test_file, "w") as f:
-            f.write("""
+PYPROJECT_NEEDS_UPDATE = b"""
 [build-system]
 requires = ["setuptools>=61.0"]
 build-backend = "setuptools.build_meta"
@@ -27,129 +25,375 @@ dependencies = [
     "requests>=2.25.0",
     "packaging>=23.0",
 ]
-            """)
-
-        # Create an analysis result
-        analysis_result = FileAnalysisResult(
-            file_path=test_file,
-            package_updates=[
-                UpdateInfo(
-                    package_name="requests",
-                    current_version="2.25.0",
-                    latest_version="2.31.0",
-                    file_path=test_file,
-                ),
-                UpdateInfo(
-                    package_name="packaging",
-                    current_version="23.0",
-                    latest_version="23.2",
+"""
+
+PYPROJECT_REQUESTS_ONLY = b"""
+[project]
+name = "test-project"
+version = "0.1.0"
+requires-python = ">=3.8"
+dependencies = ["requests>=2.25.0"]
+"""
+
+
+def test_update_dependencies(tmp_path, make_update_info):
+    """Test updating dependencies and the Python requirement in pyproject.toml"""
+    test_file = tmp_path / "pyproject.toml"
+    test_file.write_bytes(PYPROJECT_NEEDS_UPDATE)
+
+    update_results = update_dependencies(
+        [
+            FileAnalysisResult(
+                file_path=test_file,
+                package_updates=[
+                    make_update_info(test_file),
+                    make_update_info(
+                        test_file,
+                        package_name="packaging",
+                        current_version="23.0",
+                        latest_version="23.2",
+                    ),
+                ],
+                python_update=PythonVersionUpdateInfo(
+                    current_constraint=">=3.8",
+                    recommended_constraint=">=3.10",
                     file_path=test_file,
                 ),
-            ],
-            python_update=PythonVersionUpdateInfo(
-                current_constraint=">=3.8",
-                recommended_constraint=">=3.10",
-                file_path=test_file,
+            )
+        ]
+    )
+
+    assert update_results == [UpdateResult(file_path=test_file, modified=True)]
+    project = tomllib.loads(test_file.read_text())["project"]
+    assert project["requires-python"] == ">=3.10"
+    assert project["dependencies"] == ["requests>=2.31.0", "packaging>=23.2"]
+
+
+def test_update_errors(tmp_path, make_update_info):
+    """Test that a missing file is skipped while the others are updated"""
+    test_file = tmp_path / "pyproject.toml"
+    test_file.write_bytes(PYPROJECT_REQUESTS_ONLY)
+    non_existent_file = tmp_path / "non_existent.toml"
+
+    update_results = update_dependencies(
+        [
+            FileAnalysisResult(
+                file_path=test_file, package_updates=[make_update_info(test_file)]
             ),
-        )
+            FileAnalysisResult(
+                file_path=non_existent_file,
+                package_updates=[make_update_info(non_existent_file)],
+            ),
+        ]
+    )
+
+    # Only the existing file is reported
+    assert update_results == [UpdateResult(file_path=test_file, modified=True)]
+    project = tomllib.loads(test_file.read_text())["project"]
+    assert project["dependencies"] == ["requests>=2.31.0"]
 
-        # Update the dependencies
-        update_results = update_dependencies([analysis_result])
 
-        # Check that the file was updated
-        assert len(update_results) == 1
-        assert update_results[0].file_path == test_file
-        assert update_results[0].modified is True
+def test_update_dependencies_without_updates():
+    """Test that a file without updates is reported without being read"""
+    # The path doesn't exist, so any read would fail and drop the result
+    file_path = Path("/unused/pyproject.toml")
 
-        # Verify the contents of the updated file
-        with open(test_file, "r") as f:
-            content = f.read()
-            assert 'requires-python = ">=3.10"' in content
-            assert '"requests>=2.31.0"' in content or "requests>=2.31.0" in content
-            assert '"packaging>=23.2"' in content or "packaging>=23.2" in content
+    update_results = update_dependencies(
+        [FileAnalysisResult(file_path=file_path, package_updates=[])]
+    )
 
+    assert update_results == [UpdateResult(file_path=file_path, modified=False)]
 
-def test_no_updates_needed():
-    """Test when no updates are needed"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        test_file = Path(tmpdir) / "pyproject.toml"
 
-        # Create a test pyproject.toml file that's already up to date
-        with open(test_file, "w") as f:
-            f.write("""
+def test_update_dependencies_keeps_valid_toml(tmp_path, make_update_info):
+    """Test that quotes, extra constraints and similar names are preserved"""
+    test_file = tmp_path / "pyproject.toml"
+    test_file.write_text(
+        """
 [project]
 name = "test-project"
-version = "0.1.0"
-requires-python = ">=3.10"
 dependencies = [
-    "requests>=2.31.0", 
-    "packaging>=23.2",
+    "requests>=2.25.0,<3",
+    "flask==2.0.0",
+    'sk == 2.0.0; python_version >= "3.11"',
 ]
-            """)
+"""
+    )
 
-        # Create an analysis result with no updates needed
-        analysis_result = FileAnalysisResult(
-            file_path=test_file,
-            package_updates=[],  # No package updates needed
-            python_update=None,  # No Python version update needed
-        )
+    update_infos = [
+        make_update_info(test_file),
+        make_update_info(
+            test_file,
+            package_name="sk",
+            current_version="2.0.0",
+            latest_version="3.0.0",
+        ),
+    ]
+    update_dependencies(
+        [FileAnalysisResult(file_path=test_file, package_updates=update_infos)]
+    )
 
-        # Update the dependencies
-        update_results = update_dependencies([analysis_result])
+    dependencies = tomllib.loads(test_file.read_text())["project"]["dependencies"]
+    assert dependencies == [
+        "requests>=2.31.0,<3",
+        "flask==2.0.0",
+        'sk == 3.0.0; python_version >= "3.11"',
+    ]
+
+
+def test_update_dependencies_with_extras_and_other_clauses(tmp_path, make_update_info):
+    """Test that pins behind extras or other clauses are rewritten"""
+    test_file = tmp_path / "pyproject.toml"
+    test_file.write_text(
+        """
+[project]
+name = "test-project"
+dependencies = [
+    'uvicorn[standard]>=0.20.0,<1.0; python_version >= "3.8"',
+    "httpx<1,>=0.20.0",
+]
+"""
+    )
+
+    update_results = update_dependencies(
+        [
+            FileAnalysisResult(
+                file_path=test_file,
+                package_updates=[
+                    make_update_info(
+                        test_file,
+                        package_name="uvicorn",
+                        current_version="0.20.0",
+                        latest_version="0.30.0",
+                    ),
+                    make_update_info(
+                        test_file,
+                        package_name="httpx",
+                        current_version="0.20.0",
+                        latest_version="0.27.0",
+                    ),
+                ],
+            )
+        ]
+    )
+
+    assert update_results[0].modified is True
+    dependencies = tomllib.loads(test_file.read_text())["project"]["dependencies"]
+    assert dependencies == [
+        'uvicorn[standard]>=0.30.0,<1.0; python_version >= "3.8"',
+        "httpx<1,>=0.27.0",
+    ]
+
+
+def test_update_dependencies_without_matching_version(tmp_path, make_update_info):
+    """Test that a file is not reported as modified when nothing changes"""
+    test_file = tmp_path / "pyproject.toml"
+    original = '[project]\nname = "test-project"\ndependencies = ["requests>=2.28.0"]\n'
+    test_file.write_text(original)
+
+    update_results = update_dependencies(
+        [
+            FileAnalysisResult(
+                file_path=test_file,
+                package_updates=[make_update_info(test_file)],
+            )
+        ]
+    )
 
-    # Check that no files were modified
     assert len(update_results) == 1
-    assert not update_results[0].modified
+    assert update_results[0].modified is False
+    assert test_file.read_text() == original
 
 
-def test_update_errors():
-    """Test handling of errors when updating files"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        test_file = Path(tmpdir) / "pyproject.toml"
-        non_existent_file = Path(tmpdir) / "non_existent.toml"
+def test_update_dependencies_replaces_file_atomically(tmp_path, make_update_info):
+    """Test that the rewrite keeps file permissions and leaves no temp files"""
+    test_file = tmp_path / "pyproject.toml"
+    test_file.write_text('[project]\nname = "p"\ndependencies = ["requests>=2.25.0"]\n')
+    test_file.chmod(0o644)
+
+    update_results = update_dependencies(
+        [
+            FileAnalysisResult(
+                file_path=test_file,
+                package_updates=[make_update_info(test_file)],
+            )
+        ]
+    )
+
+    assert update_results[0].modified is True
+    assert '"requests>=2.31.0"' in test_file.read_text()
+    assert test_file.stat().st_mode & 0o777 == 0o644
+    assert list(tmp_path.iterdir()) == [test_file]
 
-        # Create a test pyproject.toml file
-        with open(test_file, "w") as f:
-            f.write("""
-[project]
-name = "test-project"
-version = "0.1.0"
-requires-python = ">=3.8"
-dependencies = ["requests>=2.25.0"]
-            """)
 
-        # Create analysis results including a non-existent file
-        analysis_results = [
+def test_update_dependencies_rewrites_identical_files_once(tmp_path, make_update_info):
+    """Test that identical files with identical updates share one rewrite"""
+    analysis_results = []
+    for name in ("a", "b"):
+        test_file = tmp_path / name / "pyproject.toml"
+        test_file.parent.mkdir()
+        test_file.write_text('[project]\ndependencies = ["identical>=1.0.0"]\n')
+        analysis_results.append(
             FileAnalysisResult(
                 file_path=test_file,
                 package_updates=[
-                    UpdateInfo(
-                        package_name="requests",
-                        current_version="2.25.0",
-                        latest_version="2.31.0",
+                    make_update_info(
+                        test_file,
+                        package_name="identical",
+                        current_version="1.0.0",
+                        latest_version="2.0.0",
+                    )
+                ],
+            )
+        )
+
+    with mock.patch.object(updater, "_rewrite", wraps=updater._rewrite) as mock_rewrite:
+        update_results = update_dependencies(analysis_results)
+
+    assert [r.modified for r in update_results] == [True, True]
+    for result in analysis_results:
+        assert '"identical>=2.0.0"' in result.file_path.read_text()
+    mock_rewrite.assert_called_once()
+
+
+def test_update_dependencies_python_constraint_formats(tmp_path):
+    """Test that requires-python is updated regardless of quotes and spacing"""
+    for index, line in enumerate(
+        [
+            "requires-python = '>=3.8'",
+            'requires-python=">=3.8"',
+            "requires-python  =  '>=3.8'",
+        ]
+    ):
+        test_file = tmp_path / f"pyproject{index}.toml"
+        test_file.write_text(f'[project]\nname = "p"\n{line}\n')
+
+        update_dependencies(
+            [
+                FileAnalysisResult(
+                    file_path=test_file,
+                    package_updates=[],
+                    python_update=PythonVersionUpdateInfo(
+                        current_constraint=">=3.8",
+                        recommended_constraint=">=3.10",
                         file_path=test_file,
                     ),
-                ],
-                python_update=None,
-            ),
+                )
+            ]
+        )
+
+        content = test_file.read_text()
+        assert line.replace(">=3.8", ">=3.10") in content
+        assert tomllib.loads(content)["project"]["requires-python"] == ">=3.10"
+
+
+def test_update_dependencies_with_comments(tmp_path, make_update_info):
+    """Test that comments and formatting around updated pins are preserved"""
+    test_file = tmp_path / "pyproject.toml"
+    test_file.write_text(
+        "[project]\n"
+        'name = "p"  # project name\n'
+        "dependencies = [\n"
+        '    "requests>=2.25.0",  # Current latest is 2.31.0\n'
+        "    # pinned for compatibility\n"
+        '    "packaging==23.0",\n'
+        "]\n"
+    )
+
+    update_dependencies(
+        [
             FileAnalysisResult(
-                file_path=non_existent_file,
+                file_path=test_file,
                 package_updates=[
-                    UpdateInfo(
-                        package_name="requests",
-                        current_version="2.25.0",
-                        latest_version="2.31.0",
-                        file_path=non_existent_file,
+                    make_update_info(test_file),
+                    make_update_info(
+                        test_file,
+                        package_name="packaging",
+                        current_version="23.0",
+                        latest_version="23.2",
                     ),
                 ],
-                python_update=None,
+            )
+        ]
+    )
+
+    assert test_file.read_text() == (
+        "[project]\n"
+        'name = "p"  # project name\n'
+        "dependencies = [\n"
+        '    "requests>=2.31.0",  # Current latest is 2.31.0\n'
+        "    # pinned for compatibility\n"
+        '    "packaging==23.2",\n'
+        "]\n"
+    )
+
+
+def test_update_dependencies_reuses_scanned_content(tmp_path, make_update_info):
+    """Test that content read during the scan is not read again"""
+    test_file = tmp_path / "pyproject.toml"
+    test_file.write_text('[project]\ndependencies = ["scanned>=1.0.0"]\n')
+
+    analysis_result = FileAnalysisResult(
+        file_path=test_file,
+        package_updates=[
+            make_update_info(
+                test_file,
+                package_name="scanned",
+                current_version="1.0.0",
+                latest_version="1.1.0",
+            )
+        ],
+        content=test_file.read_bytes(),
+    )
+
+    with mock.patch.object(Path, "read_bytes", side_effect=AssertionError):
+        update_results = update_dependencies([analysis_result])
+
+    assert update_results[0].modified is True
+    assert '"scanned>=1.1.0"' in test_file.read_text()
+
+
+def test_update_dependencies_io_errors(mocker, make_update_info):
+    """Test that files failing to be read or written are skipped"""
+    unreadable = Path("/repo/a/pyproject.toml")
+    unwritable = Path("/repo/b/pyproject.toml")
+    mocker.patch.object(Path, "read_bytes", side_effect=PermissionError)
+    mock_write = mocker.patch.object(
+        updater, "_write_atomic", side_effect=PermissionError
+    )
+
+    update_results = update_dependencies(
+        [
+            FileAnalysisResult(
+                file_path=unreadable, package_updates=[make_update_info(unreadable)]
+            ),
+            FileAnalysisResult(
+                file_path=unwritable,
+                package_updates=[make_update_info(unwritable)],
+                content=b'dependencies = ["requests>=2.25.0"]\n',
             ),
         ]
+    )
 
-        # Update the dependencies - should handle the non-existent file gracefully
-        update_results = update_dependencies(analysis_results)
+    assert update_results == []
+    mock_write.assert_called_once_with(
+        unwritable, b'dependencies = ["requests>=2.31.0"]\n'
+    )
+
+
+def test_update_dependencies_writes_through_symlink(tmp_path, make_update_info):
+    """Test that a symlinked pyproject.toml is updated at its target"""
+    target = tmp_path / "real" / "pyproject.toml"
+    target.parent.mkdir()
+    target.write_text('[project]\ndependencies = ["requests>=2.25.0"]\n')
+    link = tmp_path / "repo" / "pyproject.toml"
+    link.parent.mkdir()
+    link.symlink_to(Path("..") / "real" / "pyproject.toml")
+
+    update_results = update_dependencies(
+        [FileAnalysisResult(file_path=link, package_updates=[make_update_info(link)])]
+    )
 
-        # Check that only the existing file was updated
-        assert len(update_results) == 1
-        assert update_results[0].file_path == test_file
-        assert update_results[0].modified is True
+    assert update_results[0].modified is True
+    assert link.is_symlink()
+    assert '"requests>=2.31.0"' in target.read_text()